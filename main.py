@@ -1,24 +1,221 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import argparse
+import sys
+from pathlib import Path
+from typing import List
 
-from main_app.rospakovka import rospakovka
+from main_app.constants import ROLLUP_LIMIT, SNAPSHOT_CHUNK_ROWS
+from main_app.paths import BONUS__INPUT_CSV, BONUS__OUTPUT_CSV, DB_PATH, MAIN_DIR, PARTITIONS_DIR, SNAPSHOTS_DIR
 
+# тяжёлые модули (requests, pandas, numpy) импортируются внутри команд:
+# export, stats, rollups и migrate стартуют без них
+COMMANDS = ("crawl", "ingest-local", "export", "stats", "rollups", "snapshot", "migrate")
 
-def parser_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--year", type=int, required=True)
-    parser.add_argument("--max-pages", type=int, default=50)
-    parser.add_argument("--chunk-size", type=int, default=1, help="Chunk size in megabytes")
-    return parser.parse_args()
 
+def _import_options() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", type=Path, default=DB_PATH)
+    common.add_argument("--workers", type=int, default=1, help="Processes for CSV parsing/normalization")
+    common.add_argument("--db-profile", choices=["incremental", "bulk"], default="incremental",
+                        help="SQLite settings: bulk for first-time backfills")
+    common.add_argument("--commit-rows", type=int, default=None, help="Commit every N rows (default: per profile)")
+    common.add_argument("--commit-seconds", type=float, default=None,
+                        help="Commit at least every T seconds (default: per profile)")
+    common.add_argument("--fts", action="store_true",
+                        help="Maintain the full-text index over descriptions and participants "
+                             "(participants from the first row that has them; empty ones are filled on re-import)")
+    common.add_argument("--metrics-log", type=Path, default=None, help="JSON-lines file for stage metrics")
+    common.add_argument("--profile", nargs="?", const="import", choices=["download", "import"], default=None,
+                        help="cProfile the stage per archive (default: import)")
+    common.add_argument("--profile-dir", type=Path, default=MAIN_DIR / "output_dir" / "profiles")
+    return common
 
-def main(year: int = 2025) -> None:
-    print(f"Подключаемся и скачиваем ZIP за {year} год...")
-    args = parser_args()
 
-    rospakovka(year=args.year, max_pages=args.max_pages, chunk_size=args.chunk_size)
+def parser_args(argv: List[str] | None = None) -> argparse.Namespace:
+    argv = sys.argv[1:] if argv is None else argv
+    # без подкоманды — прежний запуск: python main.py --year 2025 ...
+    if argv and argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["crawl", *argv]
+
+    parser = argparse.ArgumentParser(description="Court registry loader")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="{" + ",".join(COMMANDS) + "}")
+    common = _import_options()
+
+    crawl = sub.add_parser("crawl", parents=[common], help="Download the year's archives and import them")
+    crawl.add_argument("--year", type=int, required=True)
+    crawl.add_argument("--max-pages", type=int, default=50)
+    crawl.add_argument("--chunk-size", type=int, default=1, help="Chunk size in megabytes")
+    crawl.add_argument("--download-workers", type=int, default=2, help="Parallel archive downloads")
+    crawl.add_argument("--max-temp-mb", type=int, default=None, help="Soft cap for downloaded, not yet imported ZIPs")
+    crawl.add_argument("--partitioned", action="store_true",
+                       help="Write to a per-year DB (court_registry_<year>.db) in --partitions-dir")
+    crawl.add_argument("--partitions-dir", type=Path, default=PARTITIONS_DIR)
+
+    local = sub.add_parser("ingest-local", parents=[common], help="Import already downloaded ZIP/CSV files offline")
+    local.add_argument("paths", nargs="+", help="Files, directories (recursive) or glob patterns")
+
+    export = sub.add_parser("export", help="Export cases by numbers to CSV")
+    export.add_argument("--db", type=Path, default=DB_PATH, help="DB file or directory of per-year partitions")
+    export.add_argument("--in", dest="input_csv", type=Path, default=BONUS__INPUT_CSV)
+    export.add_argument("--out", dest="output_csv", type=Path, default=BONUS__OUTPUT_CSV)
+    export.add_argument("--delimiter", default=",")
+
+    stats = sub.add_parser("stats", help="Row counts, schema version and ingest manifest summary")
+    stats.add_argument("--db", type=Path, default=DB_PATH, help="DB file or directory of per-year partitions")
+
+    rollups = sub.add_parser("rollups", help="Dashboard aggregates: judges, courts by month, stages")
+    rollups.add_argument("--db", type=Path, default=DB_PATH)
+    rollups.add_argument("--show", choices=["judges", "courts", "stages"], default="judges")
+    rollups.add_argument("--limit", type=int, default=ROLLUP_LIMIT)
+    rollups.add_argument("--rebuild", action="store_true",
+                         help="Recompute aggregates from the data tables and report drifted rows")
+
+    snapshot = sub.add_parser("snapshot", help="Columnar snapshot of the data tables (Parquet or npz)")
+    snapshot.add_argument("--db", type=Path, default=DB_PATH, help="DB file or directory of per-year partitions")
+    snapshot.add_argument("--out", dest="out_dir", type=Path, default=SNAPSHOTS_DIR)
+    snapshot.add_argument("--full", action="store_true", help="Ignore previous snapshots and export every row")
+    snapshot.add_argument("--format", dest="fmt", choices=["auto", "parquet", "npz"], default="auto",
+                          help="auto: Parquet if pyarrow is installed, otherwise compressed npz")
+    snapshot.add_argument("--chunk-rows", type=int, default=SNAPSHOT_CHUNK_ROWS, help="Rows per row group / npz part")
+
+    migrate = sub.add_parser("migrate", help="Create the DB or bring its schema up to date (readers never migrate)")
+    migrate.add_argument("--db", type=Path, default=DB_PATH, help="DB file or directory of per-year partitions")
+    return parser.parse_args(argv)
+
+
+def crawl(args: argparse.Namespace) -> int:
+    from main_app.federation import partition_path
+    from main_app.metrics import metrics
+    from main_app.rospakovka import rospakovka
+
+    print(f"Подключаемся и скачиваем ZIP за {args.year} год...")
+    metrics.configure(log_path=args.metrics_log, profile_stage=args.profile, profile_dir=args.profile_dir)
+    db_path = args.db
+    if args.partitioned:
+        # у каждого года свой файл: годы можно заливать параллельными процессами
+        args.partitions_dir.mkdir(parents=True, exist_ok=True)
+        db_path = partition_path(args.year, args.partitions_dir)
+
+    rospakovka(
+        year=args.year,
+        max_pages=args.max_pages,
+        chunk_size=args.chunk_size,
+        download_workers=args.download_workers,
+        max_temp_mb=args.max_temp_mb,
+        workers=args.workers,
+        db_path=db_path,
+        db_profile=args.db_profile,
+        commit_rows=args.commit_rows,
+        commit_seconds=args.commit_seconds,
+        fts=args.fts,
+    )
+    metrics.close()
+    return 0
+
+
+def ingest_local(args: argparse.Namespace) -> int:
+    from main_app.ingest import ingest_local as run
+    from main_app.metrics import metrics
+
+    metrics.configure(log_path=args.metrics_log, profile_stage=args.profile, profile_dir=args.profile_dir)
+    args.db.parent.mkdir(parents=True, exist_ok=True)
+    ok = run(
+        args.paths,
+        db_path=args.db,
+        workers=args.workers,
+        db_profile=args.db_profile,
+        commit_rows=args.commit_rows,
+        commit_seconds=args.commit_seconds,
+        fts=args.fts,
+    )
+    metrics.close()
+    return 0 if ok else 1
+
+
+def export(args: argparse.Namespace) -> int:
+    from main_app.bonus.export_cases_by_numbers import export_cases_by_numbers
+
+    try:
+        out = export_cases_by_numbers(args.db, args.input_csv, args.output_csv, delimiter=args.delimiter)
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        return 1
+    print(f"[OK] Выгрузка: {out}")
+    return 0
+
+
+def stats(args: argparse.Namespace) -> int:
+    from main_app.stats import format_stats
+
+    try:
+        print(format_stats(args.db))
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        return 1
+    return 0
+
+
+def rollups(args: argparse.Namespace) -> int:
+    import sqlite3
+
+    from main_app.db import require_schema
+    from main_app.rollups import court_month_counts, judge_case_counts, rebuild_rollups, stage_case_counts
+
+    try:
+        require_schema(args.db)
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        return 1
+
+    if args.rebuild:
+        conn = sqlite3.connect(args.db)
+        try:
+            for table, n in rebuild_rollups(conn).items():
+                print(f"[{'OK' if n == 0 else 'FIX'}] {table}: расхождений {n}")
+        finally:
+            conn.close()
+
+    conn = sqlite3.connect(f"{args.db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        show = {"judges": judge_case_counts, "courts": court_month_counts, "stages": stage_case_counts}[args.show]
+        for row in show(conn, args.limit):
+            print("\t".join("" if v is None else str(v) for v in row))
+    finally:
+        conn.close()
+    return 0
+
+
+def snapshot(args: argparse.Namespace) -> int:
+    from main_app.snapshot import write_snapshots
+
+    try:
+        write_snapshots(args.db, args.out_dir, full=args.full, fmt=args.fmt, chunk_rows=args.chunk_rows)
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        return 1
+    return 0
+
+
+def migrate(args: argparse.Namespace) -> int:
+    from main_app.db import init_db
+    from main_app.federation import list_partitions
+
+    paths = [p.path for p in list_partitions(args.db)] if args.db.is_dir() else [args.db]
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        init_db(path)
+        print(f"[OK] Схема актуальна: {path}")
+    return 0
+
+
+def main() -> int:
+    args = parser_args()
+    handlers = {"crawl": crawl, "ingest-local": ingest_local, "export": export, "stats": stats,
+                "rollups": rollups, "snapshot": snapshot,
+                "migrate": migrate}
+    return handlers[args.command](args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
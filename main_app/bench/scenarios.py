@@ -0,0 +1,192 @@
+from __future__ import annotations
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import requests
+
+from main_app.bench.server import LocalRegistryServer
+from main_app.bench.synthetic import generate_archives
+from main_app.config import iter_zip_csv_members
+from main_app.constants import header
+
+MB = 1024 * 1024
+
+
+def _session() -> requests.Session:
+    s = requests.Session()
+    s.headers.update(header)
+    return s
+
+
+def _crawl(ws: Path, cfg: dict) -> dict:
+    from main_app.urls import iter_year_zip_links
+
+    links = list(iter_year_zip_links(cfg["year"], SESSION=_session(), list_url=cfg["list_url"], rate=1000.0))
+    (ws / "links.json").write_text(json.dumps(links), encoding="utf-8")
+    return {"items": len(links)}
+
+
+def _download(ws: Path, cfg: dict) -> dict:
+    from main_app.urls import download_file
+
+    dest = ws / "downloads"
+    shutil.rmtree(dest, ignore_errors=True)
+    session = _session()
+    total = 0
+    for url in json.loads((ws / "links.json").read_text(encoding="utf-8")):
+        total += download_file(url, dest, SESSION=session, chunk_size=1).stat().st_size
+    return {"bytes": total}
+
+
+def _extract(ws: Path, cfg: dict) -> dict:
+    total = 0
+    for zip_path in sorted((ws / "downloads").glob("*.zip")):
+        with zipfile.ZipFile(zip_path) as zf:
+            for _, opener in iter_zip_csv_members(zf):
+                with opener() as f:
+                    while chunk := f.read(MB):
+                        total += len(chunk)
+    return {"bytes": total}
+
+
+def _import(ws: Path, cfg: dict) -> dict:
+    from main_app.import_csv_to_db import import_csv_to_db
+
+    db_path = ws / "bench.db"
+    db_path.unlink(missing_ok=True)
+    rows = 0
+    for zip_path in sorted((ws / "downloads").glob("*.zip")):
+        with zipfile.ZipFile(zip_path) as zf:
+            for info, opener in iter_zip_csv_members(zf):
+                rows += import_csv_to_db(opener, db_path, name=info.filename)
+    return {"rows": rows, "db_path": str(db_path)}
+
+
+def _export(ws: Path, cfg: dict) -> dict:
+    import sqlite3
+    from main_app.bonus.export_cases_by_numbers import export_cases_by_numbers
+
+    db_path = ws / "bench.db"
+    with sqlite3.connect(db_path) as conn:
+        numbers = [n for (n,) in conn.execute("SELECT case_number FROM cases ORDER BY id")]
+    numbers += [f"missing/{i}" for i in range(len(numbers) // 10)]
+    input_csv = ws / "input_cases.csv"
+    input_csv.write_text("case_number\n" + "\n".join(numbers) + "\n", encoding="utf-8")
+    export_cases_by_numbers(db_path=db_path, input_cases_csv=input_csv, output_csv=ws / "output_cases.csv")
+    return {"rows": len(numbers), "bytes": (ws / "output_cases.csv").stat().st_size}
+
+
+def _sync(ws: Path, cfg: dict) -> dict:
+    from main_app.rospakovka import rospakovka
+
+    db_path = ws / "sync.db"
+    db_path.unlink(missing_ok=True)
+    rospakovka(
+        cfg["year"],
+        db_path=db_path,
+        download_dir=ws / "sync_downloads",
+        list_url=cfg["list_url"],
+        download_workers=cfg.get("download_workers", 2),
+    )
+    return {"db_path": str(db_path)}
+
+
+SCENARIOS: Dict[str, Callable[[Path, dict], dict]] = {
+    "crawl": _crawl,
+    "download": _download,
+    "extract": _extract,
+    "import": _import,
+    "export": _export,
+    "sync": _sync,
+}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_in_child(name: str, ws: str, cfg: dict) -> dict:
+    t0 = time.perf_counter()
+    result = SCENARIOS[name](Path(ws), cfg)
+    seconds = time.perf_counter() - t0
+
+    out = {"seconds": round(seconds, 4), "peak_rss_mb": round(_peak_rss_bytes() / MB, 1)}
+    if "rows" in result:
+        out["rows"] = result["rows"]
+        out["rows_per_s"] = round(result["rows"] / seconds, 1) if seconds else None
+    if "bytes" in result:
+        out["mb"] = round(result["bytes"] / MB, 3)
+        out["mb_per_s"] = round(result["bytes"] / MB / seconds, 2) if seconds else None
+    if "items" in result:
+        out["items"] = result["items"]
+    if "db_path" in result:
+        db = Path(result["db_path"])
+        size = sum(p.stat().st_size for p in (db, db.with_name(db.name + "-wal")) if p.exists())
+        out["db_size_mb"] = round(size / MB, 2)
+    return out
+
+
+def run_benchmarks(
+    workspace: Path,
+    archives: int = 4,
+    rows_per_csv: int = 20_000,
+    year: int = 2025,
+    scenarios: List[str] | None = None,
+    seed: int = 0,
+) -> dict:
+    """
+    Офлайн-прогон: синтетические архивы → локальный HTTP-сервер → сценарии.
+    Каждый сценарий идёт в отдельном процессе, чтобы peak RSS не смешивался.
+    """
+    workspace = Path(workspace)
+    site = workspace / "site"
+    shutil.rmtree(site, ignore_errors=True)
+    generate_archives(site, archives=archives, rows_per_csv=rows_per_csv, year=year, seed=seed)
+
+    names = scenarios or list(SCENARIOS)
+    report = {
+        "meta": {
+            "archives": archives,
+            "rows_per_csv": rows_per_csv,
+            "year": year,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": {},
+    }
+    ctx = multiprocessing.get_context("spawn")
+    with LocalRegistryServer(site, year=year) as server:
+        cfg = {"year": year, "list_url": server.list_url}
+        for name in names:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                report["scenarios"][name] = pool.submit(_run_in_child, name, str(workspace), cfg).result()
+            print(f"[BENCH] {name}: {report['scenarios'][name]}")
+    return report
+
+
+def compare_reports(old: dict, new: dict) -> List[str]:
+    """Строки сравнения двух отчётов: время и пропускная способность по сценариям."""
+    lines = [f"{'scenario':<10} {'metric':<12} {'old':>12} {'new':>12} {'change':>9}"]
+    for name, cur in new.get("scenarios", {}).items():
+        prev = old.get("scenarios", {}).get(name)
+        if not prev:
+            continue
+        for metric in ("seconds", "rows_per_s", "mb_per_s", "peak_rss_mb", "db_size_mb"):
+            a, b = prev.get(metric), cur.get(metric)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            lines.append(f"{name:<10} {metric:<12} {a:>12} {b:>12} {change:>9}")
+    return lines
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import html
+import threading
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 10
+
+
+def _listing_html(items: List[tuple[str, date]], page: int) -> str:
+    rows = "".join(
+        f'<tr><td class="date"><span>{d:%d.%m.%Y}</span></td>'
+        f'<td><p>Стан розгляду справ, вивантаження від {d:%d.%m.%Y}</p></td>'
+        f'<td><a class="btn" href="/files/{html.escape(name)}">Завантажити</a></td></tr>'
+        for name, d in items
+    )
+    return (
+        "<html><head><meta charset='utf-8'><title>Відкриті дані</title></head><body>"
+        f"<div class='content'><h1>Набори даних</h1><table>{rows}</table>"
+        f"<div class='pager'><a href='?page={page + 1}'>Далі</a></div></div></body></html>"
+    )
+
+
+class LocalRegistryServer:
+    """
+    Локальная замена сайта реестра: страницы ?page=N в разметке листинга
+    (новые выгрузки сначала, по PAGE_SIZE на страницу, затем архивы прошлого года)
+    и сами ZIP с поддержкой Range, ETag и Last-Modified.
+    """
+
+    def __init__(self, files_dir: Path, year: int = 2025, host: str = "127.0.0.1", port: int = 0):
+        self.files_dir = Path(files_dir)
+        files = sorted(self.files_dir.glob("*.zip"), reverse=True)
+        newest = date(year, 12, 1)
+        self.items = [(p.name, newest - timedelta(days=3 * i)) for i, p in enumerate(files)]
+        # пара архивов прошлого года, чтобы сработал ранний стоп
+        self.items += [(f"old_{year - 1}_{i}.zip", date(year - 1, 12, 1) - timedelta(days=i)) for i in range(PAGE_SIZE)]
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def list_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/dsa/inshe/oddata/532/?page={{page}}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.startswith("/files/"):
+                    return self._file(Path(parsed.path).name)
+                page = int((parse_qs(parsed.query).get("page") or ["1"])[0])
+                items = server.items[(page - 1) * PAGE_SIZE: page * PAGE_SIZE]
+                body = _listing_html(items, page).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _file(self, name: str):
+                path = server.files_dir / name
+                if not path.is_file():
+                    self.send_error(404)
+                    return
+                st = path.stat()
+                etag = f'"{st.st_size:x}-{int(st.st_mtime):x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                start, end = 0, st.st_size - 1
+                rng = self.headers.get("Range")
+                if rng and rng.startswith("bytes="):
+                    a, _, b = rng[6:].partition("-")
+                    start, end = int(a), min(int(b) if b else end, end)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    left = end - start + 1
+                    while left > 0:
+                        chunk = f.read(min(left, 1024 * 1024))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        left -= len(chunk)
+
+        return Handler
+
+    def __enter__(self) -> "LocalRegistryServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="bench-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+import csv
+import random
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+from main_app.constants import rename_map
+
+COURTS = [
+    "Печерський районний суд міста Києва",
+    "Шевченківський районний суд міста Києва",
+    "Господарський суд міста Києва",
+    "Київський апеляційний суд",
+    "Дніпровський районний суд міста Києва",
+    "Львівський окружний адміністративний суд",
+    "Одеський апеляційний суд",
+    "Харківський районний суд Харківської області",
+]
+SURNAMES = [
+    "Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник",
+    "Шевчук", "Поліщук", "Мельник", "Бойко", "Лисенко", "Руденко", "Савченко",
+]
+INITIALS = ["О.В.", "І.М.", "Н.П.", "А.С.", "В.Г.", "Т.Л.", "Ю.О."]
+STAGES = [
+    "Призначено до судового розгляду",
+    "Розглянуто",
+    "Зупинено провадження",
+    "Відкрито провадження",
+    "Передано на розгляд іншого суду",
+]
+RESULTS = ["", "Задоволено", "Відмовлено", "Задоволено частково", "Залишено без розгляду"]
+DEPS = ["", "Цивільна канцелярія", "Кримінальна канцелярія", "Адміністративна канцелярія"]
+TYPES = ["Цивільна", "Кримінальна", "Адміністративна", "Господарська", "Адмінправопорушення"]
+SUBJECTS = [
+    "про стягнення заборгованості",
+    "про розірвання шлюбу",
+    "про визнання права власності",
+    "про відшкодування шкоди",
+    "ч. 1 ст. 130 КУпАП",
+]
+
+
+def _judge(rnd: random.Random) -> str:
+    return f"{rnd.choice(SURNAMES)} {rnd.choice(INITIALS)}"
+
+
+def _dmy(d: date) -> str:
+    return d.strftime("%d.%m.%Y")
+
+
+def generate_registry_csv(
+    path: Path,
+    rows: int,
+    encoding: str = "cp1251",
+    delimiter: str = "\t",
+    year: int = 2025,
+    dup_ratio: float = 0.1,
+    seed: int = 0,
+) -> Path:
+    """
+    CSV в формате реестра (колонки rename_map). Около dup_ratio строк — полные
+    дубли уже выписанных, часть дел получает несколько стадий; судьи и коллегии
+    в виде «роль: ПІБ» через «;».
+    """
+    rnd = random.Random(seed)
+    start = date(year, 1, 1)
+    written: List[List[str]] = []
+    cases = max(1, rows // 3)
+
+    with open(path, "w", encoding=encoding, newline="") as f:
+        w = csv.writer(f, delimiter=delimiter)
+        w.writerow(list(rename_map.keys()))
+        for i in range(rows):
+            if written and rnd.random() < dup_ratio:
+                w.writerow(rnd.choice(written))
+                continue
+            k = rnd.randrange(cases)
+            court = COURTS[k % len(COURTS)]
+            number = f"{k % 900 + 100}/{k}/{year % 100}"
+            reporter = _judge(rnd)
+            panel = [f"суддя-доповідач: {reporter}"]
+            if rnd.random() < 0.3:
+                panel += [f"член колегії: {_judge(rnd)}" for _ in range(2)]
+            reg = start + timedelta(days=k % 300)
+            stage = reg + timedelta(days=rnd.randrange(60))
+            row = [
+                court,
+                number,
+                f"{rnd.randrange(1, 9)}/{k}/{year}",
+                _dmy(reg) if rnd.random() > 0.02 else "",
+                f"Суддя-доповідач: {reporter}",
+                "; ".join(panel),
+                f"Позивач: ТОВ \"{rnd.choice(SURNAMES)} і партнери\", відповідач: {_judge(rnd)}",
+                _dmy(stage) if rnd.random() > 0.05 else "",
+                rnd.choice(STAGES),
+                rnd.choice(RESULTS),
+                rnd.choice(DEPS),
+                TYPES[k % len(TYPES)],
+                rnd.choice(SUBJECTS),
+            ]
+            w.writerow(row)
+            if len(written) < 10_000:
+                written.append(row)
+    return path
+
+
+def generate_archives(
+    root: Path,
+    archives: int,
+    rows_per_csv: int,
+    csv_per_archive: int = 2,
+    year: int = 2025,
+    seed: int = 0,
+) -> List[Path]:
+    """ZIP-архивы как на сайте: CSV в cp1251 и utf-8-sig плюс служебный ._-файл macOS."""
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for a in range(archives):
+        zip_path = root / f"registry_{year}_{a:03d}.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for c in range(csv_per_archive):
+                encoding = "cp1251" if c % 2 == 0 else "utf-8-sig"
+                csv_path = root / f"part_{a:03d}_{c}.csv"
+                generate_registry_csv(
+                    csv_path, rows_per_csv, encoding=encoding, year=year, seed=seed * 1000 + a * 10 + c
+                )
+                zf.write(csv_path, f"{zip_path.stem}/{csv_path.name}")
+                zf.writestr(f"__MACOSX/{zip_path.stem}/._{csv_path.name}", b"\x00\x05\x16\x07")
+                csv_path.unlink()
+        paths.append(zip_path)
+    return paths
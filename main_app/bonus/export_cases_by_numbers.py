@@ -1,11 +1,135 @@
 from __future__ import annotations
-from pathlib import Path
-from typing import List, Dict, Tuple
+import codecs
+import csv
 import sqlite3
-import pandas as pd
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from main_app.constants import (
+    CSV_SAMPLE_BYTES,
+    PREFERRED_ENCODINGS,
+    data_base__11,
+    data_base__12,
+    data_base__13,
+)
+from main_app.db import require_schema
+from main_app.federation import Federation, Partition, open_federation
+from main_app.metrics import metrics
+from main_app.text import case_number_key, sv
+
+OUTPUT_COLUMNS = [
+    "court_name", "case_number", "registration_date", "type", "description",
+    "reporting_judge", "panel_judges",
+    "last_stage_date", "last_stage_name", "last_cause_result", "last_cause_dep", "last_case_proc",
+    "not_found",
+]
+EXPORT_FETCH_ROWS = 10_000
+
+
+class _JudgeList:
+    """Агрегат SQLite: уникальные значения в порядке поступления, через "; "."""
+
+    def __init__(self):
+        self.items: List[str] = []
+
+    def add(self, item: str) -> None:
+        if item and item not in self.items:
+            self.items.append(item)
+
+    def finalize(self) -> str:
+        return "; ".join(self.items)
 
-from main_app.constants import PREFERRED_ENCODINGS
-from main_app.import_csv_to_db import sv
+
+class _ReportingJudges(_JudgeList):
+    def step(self, role, name):
+        # lower() в SQLite понимает только ASCII, поэтому роль проверяется здесь
+        if sv(role).lower().startswith("суддя-доповідач"):
+            self.add(sv(name))
+
+
+class _PanelJudges(_JudgeList):
+    def step(self, role, name):
+        role, name = sv(role), sv(name)
+        if role.lower().startswith("суддя-доповідач") or not name:
+            return
+        self.add(f"{role}: {name}" if role else name)
+
+
+def iter_input_numbers(input_csv: Path) -> Iterator[str]:
+    """
+    Потоково читает номера дел из входного CSV: колонка case_number
+    (или первый столбец), значения триммируются, пустые пропускаются.
+    """
+    with open(input_csv, "rb") as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+    enc = None
+    last_err = None
+    for candidate in PREFERRED_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(candidate)().decode(sample, final=False)
+            enc = candidate
+            break
+        except UnicodeDecodeError as e:
+            last_err = e
+    if enc is None:
+        raise RuntimeError(f"Не удалось прочитать входной CSV: {input_csv} ({last_err})")
+
+    with open(input_csv, encoding=enc, newline="") as f:
+        header_line = f.readline()
+        try:
+            delimiter = csv.Sniffer().sniff(header_line, delimiters=",;\t|").delimiter
+        except csv.Error:
+            # одна колонка — разделителя в заголовке нет
+            delimiter = ","
+        header = next(csv.reader([header_line], delimiter=delimiter), [])
+        col = 0
+        for i, c in enumerate(header):
+            if c.strip().lower() == "case_number":
+                col = i
+                break
+        for row in csv.reader(f, delimiter=delimiter):
+            n = sv(row[col]) if col < len(row) else ""
+            if n:
+                yield n
+
+
+def open_readonly(db_path: Path, partitions: List[Partition] | None = None) -> sqlite3.Connection:
+    """
+    Соединение только на чтение с агрегатами судей для data_base__13.
+    Автокоммит: каждый запрос видит последние закоммиченные данные и не держит
+    снимок WAL между запросами, поэтому чтение идёт параллельно с импортом.
+    db_path — каталог: федерация по секциям court_registry_<год>.db (federation.py),
+    partitions — их уже известный список (иначе каталог читается заново).
+    """
+    if Path(db_path).is_dir():
+        conn = open_federation(db_path, partitions)
+    else:
+        conn = sqlite3.connect(
+            f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+            isolation_level=None, check_same_thread=False,
+        )
+    conn.create_aggregate("reporting_judges", 2, _ReportingJudges)
+    conn.create_aggregate("panel_judges", 2, _PanelJudges)
+    conn.execute(data_base__11)
+    return conn
+
+
+def query_case_rows(conn: sqlite3.Connection, numbers: Iterable[str]) -> sqlite3.Cursor:
+    """
+    Строки выгрузки (в порядке OUTPUT_COLUMNS) по номерам дел: номера
+    загружаются во временную таблицу соединения, дубликаты отбрасываются.
+    Дела ищутся по ключу номера (case_number_key) — без учёта пробелов, вариантов
+    тире/косой черты и кириллических двойников латиницы; case_number в строке — как во входе.
+    Курсор отдаёт строки в порядке первого вхождения номеров.
+    """
+    if isinstance(conn, Federation):
+        return conn.query_case_rows(numbers)
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    cur.execute("DELETE FROM export_numbers")
+    cur.executemany(data_base__12, ((n, case_number_key(n)) for n in numbers))
+    cur.execute("COMMIT")
+    return cur.execute(data_base__13)
 
 
 def export_cases_by_numbers(
@@ -19,6 +143,12 @@ def export_cases_by_numbers(
     - Читает входной CSV (1 колонка: case_number).
     - Достаёт из SQLite дела, судей и последнее событие по каждому делу.
     - Пишет результат в CSV (UTF-8-SIG). Возвращает путь к выходному файлу.
+    - db_path — файл БД или каталог секций по годам (поиск сразу по всем).
+
+    Номера потоково загружаются во временную таблицу (дубликаты отбрасываются,
+    порядок сохраняется), судьи и последнее событие считаются одним запросом
+    на стороне SQLite, строки результата сразу пишутся в CSV — память не
+    зависит от числа номеров.
 
     Выходные колонки:
       court_name, case_number, registration_date, type, description,
@@ -30,161 +160,22 @@ def export_cases_by_numbers(
     input_cases_csv = Path(input_cases_csv)
     output_csv = Path(output_csv)
 
-    last_err = None
-    df_in = None
-    for enc in PREFERRED_ENCODINGS:
-        try:
-            df_in = pd.read_csv(
-                input_cases_csv,
-                encoding=enc,
-                dtype=str,
-                keep_default_na=False,
-                na_filter=False,
-                sep=None,
-                engine="python",
-            )
-            break
-        except Exception as e:
-            last_err = e
-    if df_in is None:
-        raise RuntimeError(f"Не удалось прочитать входной CSV: {input_cases_csv} ({last_err})")
-
-    col = None
-    for c in df_in.columns:
-        if c.strip().lower() == "case_number":
-            col = c
-            break
-    if col is None:
-        col = df_in.columns[0]
-
-    seen = set()
-    input_numbers: List[str] = []
-    for v in df_in[col].tolist():
-        n = sv(v)
-        if not n or n in seen:
-            continue
-        seen.add(n)
-        input_numbers.append(n)
-
-    if not input_numbers:
-        pd.DataFrame(columns=[
-            "court_name","case_number","registration_date","type","description",
-            "reporting_judge","panel_judges",
-            "last_stage_date","last_stage_name","last_cause_result","last_cause_dep","last_case_proc",
-            "not_found"
-        ]).to_csv(output_csv, index=False, encoding="utf-8-sig", sep=delimiter)
-        return output_csv
-
-    conn = sqlite3.connect(str(db_path))
+    # только чтение: схему не мигрируем, а требуем актуальную (case_latest_event,
+    # индекс по ключу номера); секции федерации проверяет open_federation
+    if not db_path.is_dir():
+        require_schema(db_path)
+    # только чтение: выгрузка может идти параллельно с импортом
+    conn = open_readonly(db_path)
     try:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-
-        def batched(seq, size=500):
-            for i in range(0, len(seq), size):
-                yield seq[i:i+size]
-
-        cases: Dict[int, dict] = {}
-        num_to_caseids: Dict[str, List[int]] = {}
-        for chunk in batched(input_numbers):
-            q = f"""
-            SELECT id, court_name, case_number, registration_date, type, description
-            FROM cases
-            WHERE case_number IN ({",".join("?"*len(chunk))})
-            """
-            for r in cur.execute(q, chunk):
-                d = dict(r)
-                cases[d["id"]] = d
-                num_to_caseids.setdefault(d["case_number"], []).append(d["id"])
-
-        case_judges: Dict[int, Dict[str, List[str]]] = {}
-        if cases:
-            ids = list(cases.keys())
-            for chunk in batched(ids):
-                q = f"""
-                SELECT cj.case_id, j.name AS judge_name, cj.role
-                FROM case_judges cj
-                JOIN judges j ON j.id = cj.judge_id
-                WHERE cj.case_id IN ({",".join("?"*len(chunk))})
-                """
-                for r in cur.execute(q, chunk):
-                    cid = r["case_id"]
-                    role = sv(r["role"])
-                    name = sv(r["judge_name"])
-                    bucket = case_judges.setdefault(cid, {"reporting": [], "panel": []})
-                    if role.lower().startswith("суддя-доповідач"):
-                        if name and name not in bucket["reporting"]:
-                            bucket["reporting"].append(name)
-                    else:
-                        pair = (f"{role}: {name}" if role else name) if name else ""
-                        if pair and pair not in bucket["panel"]:
-                            bucket["panel"].append(pair)
-
-        last_event: Dict[int, dict] = {}
-        if cases:
-            ids = list(cases.keys())
-            for chunk in batched(ids):
-                q = f"""
-                SELECT case_id, case_proc, stage_date, stage_name, cause_result, cause_dep, id
-                FROM case_events
-                WHERE case_id IN ({",".join("?"*len(chunk))})
-                """
-                for r in cur.execute(q, chunk):
-                    cid = r["case_id"]
-                    sd = sv(r["stage_date"])
-                    key = (sd if sd else "0000-00-00", int(r["id"]))
-                    prev = last_event.get(cid)
-                    if (prev is None) or ((key[0], key[1]) > (prev["_k0"], prev["_k1"])):
-                        last_event[cid] = {
-                            "last_case_proc": sv(r["case_proc"]),
-                            "last_stage_date": sd,
-                            "last_stage_name": sv(r["stage_name"]),
-                            "last_cause_result": sv(r["cause_result"]),
-                            "last_cause_dep": sv(r["cause_dep"]),
-                            "_k0": key[0], "_k1": key[1],
-                        }
-
-        rows = []
-        for num in input_numbers:
-            caseids = num_to_caseids.get(num, [])
-            if not caseids:
-                rows.append({
-                    "court_name": "", "case_number": num, "registration_date": "",
-                    "type": "", "description": "",
-                    "reporting_judge": "", "panel_judges": "",
-                    "last_stage_date": "", "last_stage_name": "",
-                    "last_cause_result": "", "last_cause_dep": "", "last_case_proc": "",
-                    "not_found": 1,
-                })
-                continue
-
-            for cid in caseids:
-                base = cases[cid]
-                judges = case_judges.get(cid, {"reporting": [], "panel": []})
-                ev = last_event.get(cid, {})
-                rows.append({
-                    "court_name": sv(base.get("court_name")),
-                    "case_number": sv(base.get("case_number")),
-                    "registration_date": sv(base.get("registration_date")),
-                    "type": sv(base.get("type")),
-                    "description": sv(base.get("description")),
-                    "reporting_judge": "; ".join(judges["reporting"]) if judges["reporting"] else "",
-                    "panel_judges": "; ".join(judges["panel"]) if judges["panel"] else "",
-                    "last_stage_date": sv(ev.get("last_stage_date", "")),
-                    "last_stage_name": sv(ev.get("last_stage_name", "")),
-                    "last_cause_result": sv(ev.get("last_cause_result", "")),
-                    "last_cause_dep": sv(ev.get("last_cause_dep", "")),
-                    "last_case_proc": sv(ev.get("last_case_proc", "")),
-                    "not_found": 0,
-                })
-
-        out_df = pd.DataFrame(rows, columns=[
-            "court_name","case_number","registration_date","type","description",
-            "reporting_judge","panel_judges",
-            "last_stage_date","last_stage_name","last_cause_result","last_cause_dep","last_case_proc",
-            "not_found",
-        ])
-        out_df.to_csv(output_csv, index=False, encoding="utf-8-sig", sep=delimiter)
+        rows = 0
+        with metrics.timer("export.write"), open(output_csv, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=delimiter, lineterminator="\n")
+            writer.writerow(OUTPUT_COLUMNS)
+            cur = query_case_rows(conn, iter_input_numbers(input_cases_csv))
+            while batch := cur.fetchmany(EXPORT_FETCH_ROWS):
+                writer.writerows(batch)
+                rows += len(batch)
+        metrics.count("export.rows", rows)
         return output_csv
     finally:
         conn.close()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+import sqlite3
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Sequence
+
+from main_app.constants import (
+    data_base__2,
+    data_base__3,
+    data_base__4,
+    data_base__5,
+    data_base__6,
+    data_base__7,
+    data_base__8,
+    data_base__15,
+    data_base__18,
+    data_base__30,
+    data_base__31,
+    data_base__39,
+)
+from main_app.id_cache import CaseKey, IdCache
+
+
+class CaseBatch(NamedTuple):
+    """
+    Столбцовая пачка, готовая к вставке: по одному списку на колонку cases/case_events
+    (case_number_key — ключ номера для поиска, event_fp — отпечаток события для
+    дедупликации) и параллельные массивы связей
+    с судьями (индекс строки пачки, роль, ПІБ).
+    """
+    court_name: List[str]
+    case_number: List[str]
+    case_number_key: List[str]
+    registration_date: List[str | None]
+    type: List[str]
+    description: List[str]
+    participants: List[str]
+    case_proc: List[str]
+    stage_date: List[str]
+    stage_name: List[str]
+    cause_result: List[str]
+    cause_dep: List[str]
+    event_fp: List[int]
+    judge_row: List[int]
+    judge_role: List[str]
+    judge_name: List[str]
+
+    def __len__(self) -> int:
+        return len(self.court_name)
+
+    @classmethod
+    def empty(cls) -> "CaseBatch":
+        return cls(*([] for _ in cls._fields))
+
+
+def _resolve_case_ids(cur: sqlite3.Cursor, keys: Sequence[CaseKey], id_cache: IdCache) -> Dict[CaseKey, int]:
+    ids, missing = id_cache.lookup_cases(keys)
+    if not missing:
+        return ids
+    cur.execute("DELETE FROM batch_case_keys")
+    cur.executemany("INSERT OR IGNORE INTO batch_case_keys(court_id, case_number) VALUES (?, ?)", missing)
+    fetched = {(int(court), number): int(cid) for court, number, cid in cur.execute(data_base__7)}
+    cur.execute("DELETE FROM batch_case_keys")
+    id_cache.put_cases(fetched)
+    ids.update(fetched)
+    return ids
+
+
+# справочник -> колонка значения
+DICTIONARIES = {"judges": "name", "courts": "name", "vocab": "value"}
+
+
+def _intern(cur: sqlite3.Cursor, table: str, missing: Sequence[str], ids: Dict[str, int]) -> None:
+    """Добавляет отсутствующие значения в справочник table и дописывает их id в ids."""
+    if not missing:
+        return
+    column = DICTIONARIES[table]
+    cur.executemany(
+        f"INSERT INTO {table}({column}) VALUES (?) ON CONFLICT({column}) DO NOTHING", ((v,) for v in missing)
+    )
+    cur.execute("DELETE FROM batch_names")
+    cur.executemany("INSERT OR IGNORE INTO batch_names(name) VALUES (?)", ((v,) for v in missing))
+    for value, vid in cur.execute(data_base__8.format(table=table, column=column)):
+        ids[value] = int(vid)
+    cur.execute("DELETE FROM batch_names")
+
+
+def _resolve_judge_ids(cur: sqlite3.Cursor, names: Sequence[str], id_cache: IdCache) -> None:
+    _intern(cur, "judges", id_cache.missing_judges(names), id_cache.judges)
+
+
+def _resolve_terms(cur: sqlite3.Cursor, table: str, values: Iterable[str], ids: Dict[str, int]) -> None:
+    _intern(cur, table, [v for v in dict.fromkeys(values) if v not in ids], ids)
+
+
+def write_batch(cur: sqlite3.Cursor, batch: CaseBatch, id_cache: IdCache, search: bool = False) -> Dict[str, int]:
+    """
+    Пакетная запись нормализованных строк: по одному executemany на таблицу,
+    id дел, судей, судов и словаря событий берутся из id_cache, промахи
+    разрешаются за пачку через временные таблицы.
+    Строки пачки применяются по порядку: UPSERT дел и UNIQUE связей/событий видят их так же, как при построчной вставке.
+    case_latest_event и сводки rollup_* обновляются только по связям и событиям,
+    вставленным этой пачкой (сводку по месяцам регистрации ведут триггеры cases);
+    search=True — новые дела пачки добавляются в полнотекстовый индекс case_search,
+    у встреченных снова дел с пустыми participants они дозаполняются.
+    Возвращает счётчики вставленных и отброшенных по UNIQUE связей и событий.
+    """
+    stats = {"links_inserted": 0, "links_conflicted": 0, "events_inserted": 0, "events_conflicted": 0}
+    if not len(batch):
+        return stats
+    cur.execute(data_base__5)
+    cur.execute(data_base__6)
+
+    _resolve_terms(cur, "courts", batch.court_name, id_cache.courts)
+    courts = id_cache.courts
+    court_ids = [courts[name] for name in batch.court_name]
+    keys = list(zip(court_ids, batch.case_number))
+    # новые дела получают id больше текущего максимума
+    last_case_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM cases").fetchone()[0]
+    cur.executemany(data_base__2, zip(
+        court_ids, batch.case_number, batch.case_number_key, batch.registration_date, batch.type, batch.description
+    ))
+    case_ids = _resolve_case_ids(cur, keys, id_cache)
+    row_case_ids = [case_ids[k] for k in keys]
+
+    if search:
+        # description — по первой строке дела, как в cases; participants — по первой
+        # строке, где они указаны. Уже проиндексированному делу участники дописываются,
+        # только если в индексе их нет (дело из --enable или без участников в первой строке)
+        new_cases, seen_participants = {}, {}
+        for cid, description, participants in zip(row_case_ids, batch.description, batch.participants):
+            if cid > last_case_id and cid not in new_cases:
+                new_cases[cid] = [cid, description, participants]
+            if participants and cid not in seen_participants:
+                seen_participants[cid] = participants
+        for cid, participants in seen_participants.items():
+            if cid in new_cases and not new_cases[cid][2]:
+                new_cases[cid][2] = participants
+        cur.executemany(data_base__18, new_cases.values())
+        cur.executemany(data_base__39, (
+            (participants, cid) for cid, participants in seen_participants.items() if cid not in new_cases
+        ))
+
+    _resolve_judge_ids(cur, batch.judge_name, id_cache)
+    judges = id_cache.judges
+
+    last_link_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM case_judges").fetchone()[0]
+    cur.executemany(data_base__3, (
+        (row_case_ids[i], judges[name], role)
+        for i, role, name in zip(batch.judge_row, batch.judge_role, batch.judge_name)
+    ))
+    stats["links_inserted"] = max(cur.rowcount, 0)
+    stats["links_conflicted"] = len(batch.judge_name) - stats["links_inserted"]
+    if stats["links_inserted"]:
+        cur.execute(data_base__30, (last_link_id,))
+
+    vocab = id_cache.vocab
+    _resolve_terms(cur, "vocab", chain(batch.stage_name, batch.cause_result, batch.cause_dep), vocab)
+    # повторы (дело, отпечаток) внутри пачки до SQLite не доходят: остаётся первая строка
+    seen = set()
+    events = []
+    for row in zip(row_case_ids, batch.event_fp, batch.case_proc, batch.stage_date,
+                   batch.stage_name, batch.cause_result, batch.cause_dep):
+        key = row[:2]
+        if key in seen:
+            continue
+        seen.add(key)
+        events.append(row[:4] + (vocab[row[4]], vocab[row[5]], vocab[row[6]]))
+    # новые события получают id больше текущего максимума — по нему находим вставленные
+    last_event_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM case_events").fetchone()[0]
+    cur.executemany(data_base__4, events)
+    stats["events_inserted"] = max(cur.rowcount, 0)
+    stats["events_conflicted"] = len(batch) - stats["events_inserted"]
+    if stats["events_inserted"]:
+        cur.execute(data_base__15, (last_event_id,))
+        cur.execute(data_base__31, (last_event_id,))
+    return stats
@@ -1,17 +1,16 @@
 import zipfile
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import IO, Callable, Iterable, Tuple
 
 
-def extract_zip(zip_path: Path, extract_root: Path) -> Path:
-    target_dir = extract_root / zip_path.stem
-    target_dir.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(target_dir)
-    return target_dir
-
-
-def iter_csv_files(root: Path) -> Iterable[Path]:
-    for p in root.rglob("*.csv"):
-        if p.is_file() and not p.name.startswith("._"):
-            yield p
+def iter_zip_csv_members(zf: zipfile.ZipFile) -> Iterable[Tuple[zipfile.ZipInfo, Callable[[], IO[bytes]]]]:
+    """
+    CSV-файлы архива без распаковки на диск: (ZipInfo члена, фабрика потока).
+    Фабрика открывает член заново при каждом вызове — поток распаковывается на лету.
+    """
+    for info in zf.infolist():
+        name = Path(info.filename).name
+        if info.is_dir() or not name.endswith(".csv") or name.startswith("._"):
+            continue
+        yield info, partial(zf.open, info)
@@ -6,6 +6,64 @@ PREFERRED_ENCODINGS = [
     "windows-1251",
     "utf-8",
 ]
+CSV_SAMPLE_BYTES = 1024 * 1024
+CSV_CHUNK_ROWS = 50_000
+CASE_CACHE_SIZE = 500_000
+
+# локальный сервис поиска дел (lookup.py)
+LOOKUP_HOST = "127.0.0.1"
+LOOKUP_PORT = 8787
+LOOKUP_POOL_SIZE = 4
+LOOKUP_CACHE_SIZE = 100_000
+LOOKUP_CACHE_TTL = 60.0
+LOOKUP_MAX_NUMBERS = 1000
+# тело POST /cases: до LOOKUP_MAX_NUMBERS номеров с запасом на JSON-обвязку
+LOOKUP_MAX_BODY_BYTES = LOOKUP_MAX_NUMBERS * 256
+SEARCH_LIMIT = 50
+ROLLUP_LIMIT = 100
+SNAPSHOT_CHUNK_ROWS = 100_000
+# столбцовые снимки (snapshot.py): словари раньше ссылающихся на них таблиц
+SNAPSHOT_TABLES = ("courts", "vocab", "judges", "cases", "case_judges", "case_events")
+
+# секционированное хранение: по файлу БД на год реестра (federation.py)
+PARTITION_DB_NAME = "court_registry_{year}.db"
+
+# таблицы данных: их вторичные индексы профиль bulk снимает на время загрузки
+DATA_TABLES = ("cases", "judges", "case_judges", "case_events")
+DB_PROFILES = {
+    # ежедневная догрузка: надёжные настройки; контрольная точка (коммит вместе
+    # с позицией в CSV) каждые commit_rows строк или commit_seconds секунд и в конце CSV
+    "incremental": {
+        "pragmas": (
+            "PRAGMA foreign_keys=ON;",
+            "PRAGMA journal_mode=WAL;",
+            "PRAGMA synchronous=NORMAL;",
+        ),
+        "commit_rows": 100_000,
+        "commit_seconds": 30.0,
+        "defer_indexes": False,
+    },
+    # первичная заливка: большой кэш и mmap, временные структуры в памяти,
+    # вторичные индексы перестраиваются один раз в конце
+    "bulk": {
+        "pragmas": (
+            "PRAGMA foreign_keys=OFF;",
+            "PRAGMA journal_mode=WAL;",
+            "PRAGMA synchronous=OFF;",
+            "PRAGMA cache_size=-524288;",
+            "PRAGMA mmap_size=1073741824;",
+            "PRAGMA temp_store=MEMORY;",
+        ),
+        "commit_rows": 200_000,
+        "commit_seconds": 60.0,
+        "defer_indexes": True,
+    },
+}
+DOWNLOAD_SEGMENTS = 4
+DOWNLOAD_SEGMENT_MIN_BYTES = 16 * 1024 * 1024
+DOWNLOAD_RETRIES = 5
+LIST_CONCURRENCY = 4
+LIST_RATE_PER_SEC = 2.0
 BASE_LIST_URL = "https://dsa.court.gov.ua/dsa/inshe/oddata/532/?page={page}"
 header = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) PythonDownloader/1.0 (+requests)",
@@ -33,6 +91,20 @@ rename_map = {
 reg__1 = re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})$")
 reg__2 = re.compile(r"^\s*([^:]+):\s*(.+?)\s*$")
 DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')
+PARTITION_RE = re.compile(r"^court_registry_(\d{4})\.db$")
+# год регистрации в конце номера дела: «757/1234/23», «1/2025»
+CASE_YEAR_RE = re.compile(r"/(\d{2}|\d{4})$")
+# раньше этого года реестр дел не ведётся: «757/5678» — номер, а не год
+CASE_YEAR_MIN = 1990
+
+# ключ номера дела (text.case_number_key): варианты тире и косой черты, кириллические
+# буквы, совпадающие по начертанию с латинскими (после upper()), невидимые символы
+CASE_NUMBER_KEY_MAP = {
+    **dict.fromkeys("\u2010\u2011\u2012\u2013\u2014\u2015\u2212", "-"),
+    **dict.fromkeys("\u2044\u2215\u29f8\\", "/"),
+    **dict(zip("АВЕІЈКМНОРСЅТУХ", "ABEIJKMHOPCSTYX")),
+    **dict.fromkeys("\u200b\u200c\u200d\u2060\ufeff\u00ad", ""),
+}
 
 data_base__1 = """
     CREATE TABLE IF NOT EXISTS cases (
@@ -68,12 +140,38 @@ data_base__1 = """
         cause_dep     TEXT,
         UNIQUE(case_id, stage_date, stage_name, cause_result, cause_dep)
     );
+
+    CREATE TABLE IF NOT EXISTS ingest_archives (
+        url            TEXT PRIMARY KEY,
+        etag           TEXT,
+        last_modified  TEXT,
+        size           INTEGER,
+        status         TEXT NOT NULL,
+        updated_at     TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS ingest_members (
+        archive_url   TEXT NOT NULL,
+        member        TEXT NOT NULL,
+        content_hash  TEXT NOT NULL,
+        row_count     INTEGER,
+        status        TEXT NOT NULL,
+        updated_at    TEXT NOT NULL,
+        PRIMARY KEY (archive_url, member)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_ingest_members_hash ON ingest_members(content_hash, status);
+
+    CREATE TABLE IF NOT EXISTS deferred_indexes (
+        name  TEXT PRIMARY KEY,
+        sql   TEXT NOT NULL
+    );
 """
 
 data_base__2 = """
-    INSERT INTO cases (court_name, case_number, registration_date, type, description)
-    VALUES (?, ?, ?, ?, ?)
-    ON CONFLICT(court_name, case_number) DO UPDATE SET
+    INSERT INTO cases (court_id, case_number, case_number_key, registration_date, type, description)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(court_id, case_number) DO UPDATE SET
         registration_date=excluded.registration_date
 """
 data_base__3 = """
@@ -84,7 +182,530 @@ data_base__3 = """
 
 
 data_base__4 = """
-        INSERT INTO case_events(case_id, case_proc, stage_date, stage_name, cause_result, cause_dep)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(case_id, stage_date, stage_name, cause_result, cause_dep) DO NOTHING
-    """
\ No newline at end of file
+        INSERT INTO case_events(case_id, fingerprint, case_proc, stage_date, stage_name_id, cause_result_id, cause_dep_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(case_id, fingerprint) DO NOTHING
+    """
+
+data_base__5 = """
+    CREATE TEMP TABLE IF NOT EXISTS batch_case_keys (
+        court_id     INTEGER NOT NULL,
+        case_number  TEXT NOT NULL,
+        PRIMARY KEY (court_id, case_number)
+    ) WITHOUT ROWID
+"""
+
+data_base__6 = """
+    CREATE TEMP TABLE IF NOT EXISTS batch_names (
+        name  TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+"""
+
+data_base__7 = """
+        SELECT k.court_id, k.case_number, c.id
+        FROM batch_case_keys k
+        JOIN cases c ON c.court_id = k.court_id AND c.case_number = k.case_number
+    """
+
+# справочники judges(name), courts(name), vocab(value): id по значениям пачки
+data_base__8 = """
+        SELECT t.{column}, t.id
+        FROM batch_names b
+        JOIN {table} t ON t.{column} = b.name
+    """
+
+data_base__9 = """
+        INSERT INTO ingest_archives(url, etag, last_modified, size, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, datetime('now'))
+        ON CONFLICT(url) DO UPDATE SET
+            etag=excluded.etag,
+            last_modified=excluded.last_modified,
+            size=excluded.size,
+            status=excluded.status,
+            updated_at=excluded.updated_at
+    """
+
+data_base__10 = """
+        INSERT INTO ingest_members(archive_url, member, content_hash, row_count, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, datetime('now'))
+        ON CONFLICT(archive_url, member) DO UPDATE SET
+            rows_done=CASE WHEN content_hash = excluded.content_hash THEN rows_done ELSE 0 END,
+            content_hash=excluded.content_hash,
+            row_count=excluded.row_count,
+            status=excluded.status,
+            updated_at=excluded.updated_at
+    """
+
+data_base__11 = """
+    CREATE TEMP TABLE IF NOT EXISTS export_numbers (
+        pos          INTEGER PRIMARY KEY,
+        case_number  TEXT NOT NULL UNIQUE,
+        case_key     TEXT NOT NULL
+    )
+"""
+
+data_base__12 = """
+        INSERT OR IGNORE INTO export_numbers(case_number, case_key) VALUES (?, ?)
+    """
+
+data_base__13 = """
+        SELECT
+            COALESCE(TRIM(c.court_name), ''),
+            n.case_number,
+            COALESCE(TRIM(c.registration_date), ''),
+            COALESCE(TRIM(c.type), ''),
+            COALESCE(TRIM(c.description), ''),
+            COALESCE((
+                SELECT reporting_judges(cj.role, j.name)
+                FROM case_judges cj JOIN judges j ON j.id = cj.judge_id
+                WHERE cj.case_id = c.id
+            ), ''),
+            COALESCE((
+                SELECT panel_judges(cj.role, j.name)
+                FROM case_judges cj JOIN judges j ON j.id = cj.judge_id
+                WHERE cj.case_id = c.id
+            ), ''),
+            COALESCE(TRIM(e.stage_date), ''),
+            COALESCE(TRIM(e.stage_name), ''),
+            COALESCE(TRIM(e.cause_result), ''),
+            COALESCE(TRIM(e.cause_dep), ''),
+            COALESCE(TRIM(e.case_proc), ''),
+            c.id IS NULL
+        FROM export_numbers n
+        LEFT JOIN v_cases c ON c.case_number_key = n.case_key
+        LEFT JOIN case_latest_event le ON le.case_id = c.id
+        LEFT JOIN v_case_events e ON e.id = le.event_id
+        ORDER BY n.pos, c.id
+    """
+
+# миграции схемы поверх data_base__1; номер применённой — в PRAGMA user_version
+data_base__14 = """
+    CREATE INDEX IF NOT EXISTS idx_cases_case_number ON cases(case_number);
+
+    CREATE TABLE IF NOT EXISTS case_latest_event (
+        case_id    INTEGER PRIMARY KEY REFERENCES cases(id) ON DELETE CASCADE,
+        event_id   INTEGER NOT NULL,
+        sort_date  TEXT NOT NULL
+    );
+
+    INSERT OR REPLACE INTO case_latest_event(case_id, event_id, sort_date)
+    SELECT case_id, id, sort_date FROM (
+        SELECT case_id, id,
+               COALESCE(NULLIF(TRIM(stage_date), ''), '0000-00-00') AS sort_date,
+               ROW_NUMBER() OVER (
+                   PARTITION BY case_id
+                   ORDER BY COALESCE(NULLIF(TRIM(stage_date), ''), '0000-00-00') DESC, id DESC
+               ) AS rn
+        FROM case_events
+    )
+    WHERE rn = 1;
+"""
+
+
+# последнее событие дела — максимум (sort_date, id); id > ? — только что вставленные события
+data_base__15 = """
+        INSERT INTO case_latest_event(case_id, event_id, sort_date)
+        SELECT case_id, id, COALESCE(NULLIF(TRIM(stage_date), ''), '0000-00-00')
+        FROM case_events
+        WHERE id > ?
+        ON CONFLICT(case_id) DO UPDATE SET
+            event_id=excluded.event_id,
+            sort_date=excluded.sort_date
+        WHERE (excluded.sort_date, excluded.event_id) > (case_latest_event.sort_date, case_latest_event.event_id)
+    """
+
+# необязательный полнотекстовый индекс (search.py): rowid = cases.id
+data_base__16 = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS case_search USING fts5(
+        description,
+        participants,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+data_base__17 = """
+        INSERT INTO case_search(rowid, description, participants)
+        SELECT id, COALESCE(description, ''), '' FROM cases
+    """
+
+data_base__18 = """
+        INSERT INTO case_search(rowid, description, participants) VALUES (?, ?, ?)
+    """
+
+data_base__19 = """
+        SELECT s.rowid, c.court_name, c.case_number, s.rank
+        FROM case_search s
+        JOIN v_cases c ON c.id = s.rowid
+        WHERE case_search MATCH ?
+        ORDER BY s.rank
+        LIMIT ?
+    """
+
+# словарное кодирование: суд и тексты событий хранятся как id справочников,
+# представления v_cases / v_case_events отдают прежние имена колонок.
+# case_proc остаётся TEXT: это номер провадження, уникальный для дела, а не словарь
+data_base__20 = """
+    CREATE TABLE IF NOT EXISTS courts (
+        id    INTEGER PRIMARY KEY,
+        name  TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS vocab (
+        id     INTEGER PRIMARY KEY,
+        value  TEXT NOT NULL UNIQUE
+    );
+
+    INSERT OR IGNORE INTO courts(name) SELECT court_name FROM cases ORDER BY id;
+    INSERT OR IGNORE INTO vocab(value)
+        SELECT value FROM (
+            SELECT id, stage_name AS value FROM case_events
+            UNION ALL SELECT id, cause_result FROM case_events
+            UNION ALL SELECT id, cause_dep FROM case_events
+        )
+        WHERE value IS NOT NULL
+        ORDER BY id;
+
+    CREATE TABLE cases_new (
+        id                 INTEGER PRIMARY KEY,
+        court_id           INTEGER NOT NULL REFERENCES courts(id),
+        case_number        TEXT NOT NULL,
+        registration_date  DATE,
+        type               TEXT,
+        description        TEXT,
+        UNIQUE(court_id, case_number)
+    );
+    INSERT INTO cases_new(id, court_id, case_number, registration_date, type, description)
+        SELECT c.id, co.id, c.case_number, c.registration_date, c.type, c.description
+        FROM cases c JOIN courts co ON co.name = c.court_name;
+    DROP TABLE cases;
+    ALTER TABLE cases_new RENAME TO cases;
+    CREATE INDEX IF NOT EXISTS idx_cases_case_number ON cases(case_number);
+
+    CREATE TABLE case_events_new (
+        id               INTEGER PRIMARY KEY,
+        case_id          INTEGER NOT NULL REFERENCES cases(id) ON DELETE CASCADE,
+        case_proc        TEXT,
+        stage_date       TEXT,
+        stage_name_id    INTEGER REFERENCES vocab(id),
+        cause_result_id  INTEGER REFERENCES vocab(id),
+        cause_dep_id     INTEGER REFERENCES vocab(id),
+        UNIQUE(case_id, stage_date, stage_name_id, cause_result_id, cause_dep_id)
+    );
+    INSERT INTO case_events_new(id, case_id, case_proc, stage_date, stage_name_id, cause_result_id, cause_dep_id)
+        SELECT e.id, e.case_id, e.case_proc, e.stage_date, s.id, r.id, d.id
+        FROM case_events e
+        LEFT JOIN vocab s ON s.value = e.stage_name
+        LEFT JOIN vocab r ON r.value = e.cause_result
+        LEFT JOIN vocab d ON d.value = e.cause_dep;
+    DROP TABLE case_events;
+    ALTER TABLE case_events_new RENAME TO case_events;
+
+    -- справочники — скалярными подзапросами, а не JOIN: представление из одной
+    -- таблицы SQLite встраивает в запрос и справа от LEFT JOIN, без материализации
+    CREATE VIEW IF NOT EXISTS v_cases AS
+        SELECT c.id,
+               (SELECT name FROM courts WHERE id = c.court_id) AS court_name,
+               c.case_number, c.registration_date, c.type, c.description
+        FROM cases c;
+
+    CREATE VIEW IF NOT EXISTS v_case_events AS
+        SELECT e.id, e.case_id, e.case_proc, e.stage_date,
+               (SELECT value FROM vocab WHERE id = e.stage_name_id) AS stage_name,
+               (SELECT value FROM vocab WHERE id = e.cause_result_id) AS cause_result,
+               (SELECT value FROM vocab WHERE id = e.cause_dep_id) AS cause_dep
+        FROM case_events e;
+"""
+
+# дедупликация событий по 64-битному отпечатку (fingerprint.event_fingerprint):
+# вместо UNIQUE по пяти колонкам — компактный UNIQUE(case_id, fingerprint).
+# Совпавшие по содержимому события схлопываются (INSERT OR IGNORE), для затронутых
+# дел последнее событие пересчитывается
+data_base__21 = """
+    DROP VIEW IF EXISTS v_case_events;
+
+    CREATE TABLE case_events_new (
+        id               INTEGER PRIMARY KEY,
+        case_id          INTEGER NOT NULL REFERENCES cases(id) ON DELETE CASCADE,
+        fingerprint      INTEGER NOT NULL,
+        case_proc        TEXT,
+        stage_date       TEXT,
+        stage_name_id    INTEGER REFERENCES vocab(id),
+        cause_result_id  INTEGER REFERENCES vocab(id),
+        cause_dep_id     INTEGER REFERENCES vocab(id),
+        UNIQUE(case_id, fingerprint)
+    );
+    INSERT OR IGNORE INTO case_events_new(
+        id, case_id, fingerprint, case_proc, stage_date, stage_name_id, cause_result_id, cause_dep_id
+    )
+        SELECT e.id, e.case_id,
+               event_fingerprint(
+                   e.stage_date,
+                   (SELECT value FROM vocab WHERE id = e.stage_name_id),
+                   (SELECT value FROM vocab WHERE id = e.cause_result_id),
+                   (SELECT value FROM vocab WHERE id = e.cause_dep_id)
+               ),
+               e.case_proc, e.stage_date, e.stage_name_id, e.cause_result_id, e.cause_dep_id
+        FROM case_events e
+        ORDER BY e.id;
+    DROP TABLE case_events;
+    ALTER TABLE case_events_new RENAME TO case_events;
+
+    CREATE VIEW IF NOT EXISTS v_case_events AS
+        SELECT e.id, e.case_id, e.case_proc, e.stage_date,
+               (SELECT value FROM vocab WHERE id = e.stage_name_id) AS stage_name,
+               (SELECT value FROM vocab WHERE id = e.cause_result_id) AS cause_result,
+               (SELECT value FROM vocab WHERE id = e.cause_dep_id) AS cause_dep
+        FROM case_events e;
+
+    DELETE FROM case_latest_event WHERE event_id NOT IN (SELECT id FROM case_events);
+    INSERT INTO case_latest_event(case_id, event_id, sort_date)
+    SELECT case_id, id, sort_date FROM (
+        SELECT case_id, id,
+               COALESCE(NULLIF(TRIM(stage_date), ''), '0000-00-00') AS sort_date,
+               ROW_NUMBER() OVER (
+                   PARTITION BY case_id
+                   ORDER BY COALESCE(NULLIF(TRIM(stage_date), ''), '0000-00-00') DESC, id DESC
+               ) AS rn
+        FROM case_events
+        WHERE case_id NOT IN (SELECT case_id FROM case_latest_event)
+    )
+    WHERE rn = 1;
+"""
+
+# федеративная выгрузка (federation.py): найденные дела всех секций копятся во временной таблице
+data_base__22 = """
+    CREATE TEMP TABLE IF NOT EXISTS export_hits (
+        part INTEGER, pos INTEGER, case_id INTEGER, sort_date TEXT,
+        court_name TEXT, registration_date TEXT, type TEXT, description TEXT,
+        reporting_judge TEXT, panel_judges TEXT,
+        stage_date TEXT, stage_name TEXT, cause_result TEXT, cause_dep TEXT, case_proc TEXT
+    )
+"""
+
+# найденные дела одной подключённой секции {db} (год {year}); номер с годом позже
+# года секции в ней быть не может и не ищется
+data_base__23 = """
+        INSERT INTO export_hits
+        SELECT
+            {part},
+            n.pos,
+            c.id,
+            COALESCE(le.sort_date, ''),
+            COALESCE(TRIM(c.court_name), ''),
+            COALESCE(TRIM(c.registration_date), ''),
+            COALESCE(TRIM(c.type), ''),
+            COALESCE(TRIM(c.description), ''),
+            COALESCE((
+                SELECT reporting_judges(cj.role, j.name)
+                FROM {db}.case_judges cj JOIN {db}.judges j ON j.id = cj.judge_id
+                WHERE cj.case_id = c.id
+            ), ''),
+            COALESCE((
+                SELECT panel_judges(cj.role, j.name)
+                FROM {db}.case_judges cj JOIN {db}.judges j ON j.id = cj.judge_id
+                WHERE cj.case_id = c.id
+            ), ''),
+            COALESCE(TRIM(e.stage_date), ''),
+            COALESCE(TRIM(e.stage_name), ''),
+            COALESCE(TRIM(e.cause_result), ''),
+            COALESCE(TRIM(e.cause_dep), ''),
+            COALESCE(TRIM(e.case_proc), '')
+        FROM export_numbers n
+        JOIN {db}.v_cases c ON c.case_number_key = n.case_key
+        LEFT JOIN {db}.case_latest_event le ON le.case_id = c.id
+        LEFT JOIN {db}.v_case_events e ON e.id = le.event_id
+        WHERE COALESCE(case_year(n.case_key), 0) <= {year}
+    """
+
+# объединение секций: дело (суд, номер) из нескольких секций берётся из той,
+# где его последнее событие самое позднее (при равенстве — из более новой секции)
+data_base__24 = """
+        SELECT
+            COALESCE(h.court_name, ''), n.case_number,
+            COALESCE(h.registration_date, ''), COALESCE(h.type, ''), COALESCE(h.description, ''),
+            COALESCE(h.reporting_judge, ''), COALESCE(h.panel_judges, ''),
+            COALESCE(h.stage_date, ''), COALESCE(h.stage_name, ''), COALESCE(h.cause_result, ''),
+            COALESCE(h.cause_dep, ''), COALESCE(h.case_proc, ''),
+            h.case_id IS NULL
+        FROM export_numbers n
+        LEFT JOIN (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY pos, court_name ORDER BY sort_date DESC, part DESC
+            ) AS rn
+            FROM export_hits
+        ) h ON h.pos = n.pos AND h.rn = 1
+        ORDER BY n.pos, h.part, h.case_id
+    """
+
+# контрольные точки импорта: сколько строк CSV-члена уже закоммичено
+data_base__25 = """
+    ALTER TABLE ingest_members ADD COLUMN rows_done INTEGER NOT NULL DEFAULT 0;
+"""
+
+# сводные таблицы для дашбордов (rollups.py): дела по судье и роли, по суду и месяцу
+# регистрации, по стадии. Свежий расчёт — для заполнения и проверки (rebuild_rollups)
+data_base__27 = """
+        SELECT judge_id, role, COUNT(*) FROM case_judges GROUP BY judge_id, role
+    """
+data_base__28 = """
+        SELECT court_id, COALESCE(substr(registration_date, 1, 7), ''), COUNT(*) FROM cases GROUP BY 1, 2
+    """
+data_base__29 = """
+        SELECT stage_name_id, COUNT(DISTINCT case_id), COUNT(*) FROM case_events GROUP BY stage_name_id
+    """
+
+# cases — единственная таблица с обновлением на месте (UPSERT registration_date), поэтому
+# месяц регистрации ведут триггеры: по строке вставки/удаления и только при смене месяца.
+# Шаг, пересоздающий cases, должен создать эти триггеры заново
+data_base__26 = f"""
+    CREATE TABLE IF NOT EXISTS rollup_judge_role (
+        judge_id  INTEGER NOT NULL,
+        role      TEXT NOT NULL,
+        cases     INTEGER NOT NULL,
+        PRIMARY KEY (judge_id, role)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollup_court_month (
+        court_id  INTEGER NOT NULL,
+        month     TEXT NOT NULL,
+        cases     INTEGER NOT NULL,
+        PRIMARY KEY (court_id, month)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollup_stage (
+        stage_name_id  INTEGER PRIMARY KEY,
+        cases          INTEGER NOT NULL,
+        events         INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS rollup_cases_insert AFTER INSERT ON cases BEGIN
+        INSERT INTO rollup_court_month(court_id, month, cases)
+        VALUES (NEW.court_id, COALESCE(substr(NEW.registration_date, 1, 7), ''), 1)
+        ON CONFLICT(court_id, month) DO UPDATE SET cases = cases + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS rollup_cases_delete AFTER DELETE ON cases BEGIN
+        UPDATE rollup_court_month SET cases = cases - 1
+        WHERE court_id = OLD.court_id AND month = COALESCE(substr(OLD.registration_date, 1, 7), '');
+        DELETE FROM rollup_court_month WHERE court_id = OLD.court_id AND cases <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS rollup_cases_update AFTER UPDATE OF court_id, registration_date ON cases
+    WHEN OLD.court_id IS NOT NEW.court_id
+        OR COALESCE(substr(OLD.registration_date, 1, 7), '') IS NOT COALESCE(substr(NEW.registration_date, 1, 7), '')
+    BEGIN
+        UPDATE rollup_court_month SET cases = cases - 1
+        WHERE court_id = OLD.court_id AND month = COALESCE(substr(OLD.registration_date, 1, 7), '');
+        DELETE FROM rollup_court_month WHERE court_id = OLD.court_id AND cases <= 0;
+        INSERT INTO rollup_court_month(court_id, month, cases)
+        VALUES (NEW.court_id, COALESCE(substr(NEW.registration_date, 1, 7), ''), 1)
+        ON CONFLICT(court_id, month) DO UPDATE SET cases = cases + 1;
+    END;
+
+    INSERT INTO rollup_judge_role(judge_id, role, cases) {data_base__27};
+    INSERT INTO rollup_court_month(court_id, month, cases) {data_base__28};
+    INSERT INTO rollup_stage(stage_name_id, cases, events) {data_base__29};
+"""
+
+# связи и события только вставляются: сводки досчитываются по строкам пачки (id > ?)
+data_base__30 = """
+        INSERT INTO rollup_judge_role(judge_id, role, cases)
+        SELECT judge_id, role, COUNT(*) FROM case_judges WHERE id > ? GROUP BY judge_id, role
+        ON CONFLICT(judge_id, role) DO UPDATE SET cases = cases + excluded.cases
+    """
+
+# дело добавляется к стадии, если раньше (id <= ?) событий этой стадии у него не было
+data_base__31 = """
+        INSERT INTO rollup_stage(stage_name_id, cases, events)
+        SELECT
+            e.stage_name_id,
+            COUNT(DISTINCT e.case_id) FILTER (WHERE NOT EXISTS (
+                SELECT 1 FROM case_events o
+                WHERE o.case_id = e.case_id AND o.stage_name_id = e.stage_name_id AND o.id <= ?1
+            )),
+            COUNT(*)
+        FROM case_events e
+        WHERE e.id > ?1
+        GROUP BY e.stage_name_id
+        ON CONFLICT(stage_name_id) DO UPDATE SET
+            cases = cases + excluded.cases,
+            events = events + excluded.events
+    """
+
+# выборки для дашбордов
+data_base__32 = """
+        SELECT j.name, r.role, r.cases
+        FROM rollup_judge_role r JOIN judges j ON j.id = r.judge_id
+        ORDER BY r.cases DESC, j.name, r.role
+        LIMIT ?
+    """
+data_base__33 = """
+        SELECT c.name, r.month, r.cases
+        FROM rollup_court_month r JOIN courts c ON c.id = r.court_id
+        ORDER BY c.name, r.month
+        LIMIT ?
+    """
+data_base__34 = """
+        SELECT v.value, r.cases, r.events
+        FROM rollup_stage r JOIN vocab v ON v.id = r.stage_name_id
+        ORDER BY r.cases DESC, v.value
+        LIMIT ?
+    """
+
+# ключ номера дела (text.case_number_key) для поиска без учёта записи: заполняется
+# по уже загруженным делам, индекс по ключу заменяет индекс по номеру
+data_base__35 = """
+    ALTER TABLE cases ADD COLUMN case_number_key TEXT;
+    UPDATE cases SET case_number_key = case_number_key(case_number);
+    DROP INDEX IF EXISTS idx_cases_case_number;
+    CREATE INDEX IF NOT EXISTS idx_cases_case_number_key ON cases(case_number_key);
+
+    DROP VIEW IF EXISTS v_cases;
+    CREATE VIEW IF NOT EXISTS v_cases AS
+        SELECT c.id,
+               (SELECT name FROM courts WHERE id = c.court_id) AS court_name,
+               c.case_number, c.case_number_key, c.registration_date, c.type, c.description
+        FROM cases c;
+"""
+
+# журнал изменённых на месте дел для инкрементальных снимков (snapshot.py): строка на дело,
+# seq — номер последнего изменения. Остальные таблицы данных только дописываются,
+# новые строки снимок находит по id
+data_base__36 = """
+    CREATE TABLE IF NOT EXISTS case_changes (
+        case_id  INTEGER PRIMARY KEY,
+        seq      INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_case_changes_seq ON case_changes(seq);
+
+    CREATE TRIGGER IF NOT EXISTS snapshot_cases_update AFTER UPDATE ON cases
+    WHEN OLD.court_id IS NOT NEW.court_id
+        OR OLD.case_number IS NOT NEW.case_number
+        OR OLD.registration_date IS NOT NEW.registration_date
+        OR OLD.type IS NOT NEW.type
+        OR OLD.description IS NOT NEW.description
+    BEGIN
+        INSERT INTO case_changes(case_id, seq)
+        VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM case_changes))
+        ON CONFLICT(case_id) DO UPDATE SET seq = excluded.seq;
+    END;
+"""
+
+# строки снимка: новые (id в (?1, ?2]); для cases — ещё и изменённые после прошлого
+# снимка (seq журнала в (?3, ?4]) из уже выгруженных ранее
+data_base__37 = """
+        SELECT {columns} FROM {table} WHERE id > ?1 AND id <= ?2 ORDER BY id
+    """
+data_base__38 = """
+        SELECT {columns} FROM cases
+        WHERE id IN (SELECT case_id FROM case_changes WHERE seq > ?3 AND seq <= ?4) AND id <= ?1
+    """
+
+# участники уже проиндексированного дела: заполняются, только пока пусты
+data_base__39 = """
+        UPDATE case_search SET participants = ? WHERE rowid = ? AND participants = ''
+    """
+
+SCHEMA_MIGRATIONS = (
+    data_base__14, data_base__20, data_base__21, data_base__25, data_base__26, data_base__35, data_base__36,
+)
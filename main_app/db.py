@@ -1,8 +1,16 @@
 from __future__ import annotations
 import sqlite3
+import time
 from pathlib import Path
+from typing import Callable, Dict
 
-from main_app.constants import data_base__1
+from main_app.bulk_writer import CaseBatch, write_batch
+from main_app.constants import DATA_TABLES, DB_PROFILES, SCHEMA_MIGRATIONS, data_base__1
+from main_app.fingerprint import event_fingerprint
+from main_app.id_cache import IdCache
+from main_app.metrics import metrics
+from main_app.search import enable_search, search_enabled
+from main_app.text import case_number_key
 
 
 def get_conn(db_path: Path) -> sqlite3.Connection:
@@ -18,4 +26,189 @@ def init_db(db_path: Path) -> None:
 
     cur.executescript(data_base__1)
     conn.commit()
+    migrate(conn)
     conn.close()
+
+
+def require_schema(db_path: Path) -> None:
+    """
+    Для читателей (выгрузка, поиск, снимки): БД существует и её схема актуальна.
+    Читатели открывают файл только на чтение и не мигрируют его — это делает
+    сессия записи (импорт) или `main.py migrate`.
+    """
+    db_path = Path(db_path)
+    if not db_path.is_file():
+        raise RuntimeError(f"Нет БД: {db_path}")
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    finally:
+        conn.close()
+    if version < len(SCHEMA_MIGRATIONS):
+        raise RuntimeError(
+            f"{db_path}: схема версии {version}, нужна {len(SCHEMA_MIGRATIONS)} — "
+            f"обновите её импортом или `python main.py migrate --db {db_path}`"
+        )
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Доводит схему до последней версии: применяет шаги SCHEMA_MIGRATIONS после
+    записанного в PRAGMA user_version. Каждый шаг — отдельная транзакция вместе
+    с новым номером версии; место, освобождённое пересозданием таблиц, вернёт VACUUM.
+    Возвращает итоговую версию схемы.
+    """
+    version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    if version >= len(SCHEMA_MIGRATIONS):
+        return version
+    # шаги пересоздают таблицы (DROP + RENAME): с включёнными FK DROP TABLE cases
+    # каскадно удалил бы связи; вне транзакции прагма действует, внутри — нет
+    foreign_keys = conn.execute("PRAGMA foreign_keys;").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys=OFF;")
+    conn.create_function("event_fingerprint", 4, event_fingerprint, deterministic=True)
+    conn.create_function("case_number_key", 1, case_number_key, deterministic=True)
+    try:
+        for number, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            with metrics.timer("db.migrate", version=number):
+                try:
+                    conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version={number};\nCOMMIT;")
+                except sqlite3.Error:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    raise
+            print(f"[DB] Схема обновлена до версии {number}")
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'};")
+    return len(SCHEMA_MIGRATIONS)
+
+
+class DbSession:
+    """
+    Одно соединение на весь прогон синхронизации: схема создаётся один раз,
+    кэш id общий для всех CSV, коммит — каждые commit_rows строк или commit_seconds
+    секунд и в конце CSV. on_commit вызывается перед каждым коммитом в той же
+    транзакции: так импорт сохраняет контрольную точку (позицию в CSV) атомарно с данными.
+
+    Профили (DB_PROFILES):
+      incremental — WAL + synchronous=NORMAL, как раньше; для ежедневных запусков;
+      bulk        — большой cache_size/mmap_size, temp_store=MEMORY, synchronous=OFF;
+                    вторичные индексы таблиц данных снимаются при открытии и
+                    перестраиваются при закрытии. UNIQUE-ограничения остаются:
+                    на них опираются ON CONFLICT-ы UPSERT-ов.
+    Снятые индексы запоминаются в deferred_indexes и восстанавливаются при
+    следующем открытии, если прошлый прогон упал.
+    fts=True создаёт полнотекстовый индекс case_search; если он уже есть в БД,
+    импорт поддерживает его всегда.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        profile: str = "incremental",
+        commit_rows: int | None = None,
+        fts: bool = False,
+        commit_seconds: float | None = None,
+    ):
+        if profile not in DB_PROFILES:
+            raise ValueError(f"неизвестный профиль БД: {profile}")
+        self.db_path = Path(db_path)
+        self.profile = profile
+        self.settings = DB_PROFILES[profile]
+        self.commit_rows = self.settings["commit_rows"] if commit_rows is None else commit_rows
+        self.commit_seconds = self.settings["commit_seconds"] if commit_seconds is None else commit_seconds
+        self.on_commit: Callable[[], None] | None = None
+        self.conn: sqlite3.Connection | None = None
+        self.id_cache = IdCache()
+        self.fts = fts
+        self._pending_rows = 0
+        self._last_commit = time.monotonic()
+
+    def __enter__(self) -> "DbSession":
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(commit=exc_type is None)
+
+    def open(self) -> "DbSession":
+        init_db(self.db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        for pragma in self.settings["pragmas"]:
+            self.conn.execute(pragma)
+        self._restore_indexes()
+        if self.fts:
+            enable_search(self.conn)
+        self.fts = search_enabled(self.conn)
+        if self.settings["defer_indexes"]:
+            self._defer_indexes()
+        self.id_cache.warm(self.conn)
+        self._last_commit = time.monotonic()
+        return self
+
+    def write(self, batch: CaseBatch) -> Dict[str, int]:
+        stats = write_batch(self.conn.cursor(), batch, self.id_cache, search=self.fts)
+        self._pending_rows += len(batch)
+        if (self.commit_rows and self._pending_rows >= self.commit_rows) or \
+                (self.commit_seconds and time.monotonic() - self._last_commit >= self.commit_seconds):
+            self.commit()
+        return stats
+
+    def commit(self) -> None:
+        with metrics.timer("db.commit", rows=self._pending_rows):
+            if self.on_commit is not None:
+                self.on_commit()
+            self.conn.commit()
+        self._pending_rows = 0
+        self._last_commit = time.monotonic()
+
+    def rollback(self) -> None:
+        """Откат незакоммиченных пачек; кэш id перечитывается из БД."""
+        self.conn.rollback()
+        self._pending_rows = 0
+        self.id_cache.reset(self.conn)
+
+    def close(self, commit: bool = True) -> None:
+        """
+        commit=True — чистое завершение: коммит, возврат снятых индексов, PRAGMA optimize.
+        commit=False — прогон прерван: незакоммиченные пачки откатываются, индексы
+        вернёт следующее открытие.
+        """
+        if self.conn is None:
+            return
+        try:
+            if not commit:
+                self.conn.rollback()
+                self._pending_rows = 0
+                return
+            self.commit()
+            self._restore_indexes()
+            self.conn.execute("PRAGMA optimize;")
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def _defer_indexes(self) -> None:
+        marks = ",".join("?" * len(DATA_TABLES))
+        rows = self.conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL AND tbl_name IN ({marks})",
+            DATA_TABLES,
+        ).fetchall()
+        with self.conn:
+            for name, sql in rows:
+                self.conn.execute("INSERT OR REPLACE INTO deferred_indexes(name, sql) VALUES (?, ?)", (name, sql))
+                self.conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        if rows:
+            print(f"[DB] Профиль bulk: сняты индексы до конца загрузки: {', '.join(n for n, _ in rows)}")
+
+    def _restore_indexes(self) -> None:
+        rows = self.conn.execute("SELECT name, sql FROM deferred_indexes").fetchall()
+        if not rows:
+            return
+        with metrics.timer("db.reindex", indexes=len(rows)), self.conn:
+            for name, sql in rows:
+                exists = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)
+                ).fetchone()
+                if not exists:
+                    self.conn.execute(sql)
+                self.conn.execute("DELETE FROM deferred_indexes WHERE name=?", (name,))
+        print(f"[DB] Индексы перестроены: {', '.join(n for n, _ in rows)}")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import datetime
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple
+
+from main_app.constants import (
+    CASE_YEAR_MIN,
+    CASE_YEAR_RE,
+    PARTITION_DB_NAME,
+    PARTITION_RE,
+    data_base__12,
+    data_base__22,
+    data_base__23,
+    data_base__24,
+)
+from main_app.db import require_schema
+from main_app.metrics import metrics
+from main_app.paths import PARTITIONS_DIR
+from main_app.text import case_number_key
+
+
+class Partition(NamedTuple):
+    year: int
+    path: Path
+
+    @property
+    def alias(self) -> str:
+        return f"p{self.year}"
+
+
+def partition_path(year: int, root: Path = PARTITIONS_DIR) -> Path:
+    """Файл БД секции за год реестра: каждый год пишет свой процесс импорта."""
+    return Path(root) / PARTITION_DB_NAME.format(year=year)
+
+
+def list_partitions(root: Path = PARTITIONS_DIR) -> List[Partition]:
+    """Секции в каталоге root по возрастанию года."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    found = []
+    for p in root.iterdir():
+        m = PARTITION_RE.match(p.name)
+        if m and p.is_file():
+            found.append(Partition(int(m.group(1)), p))
+    return sorted(found)
+
+
+def case_year(case_number: str | None) -> int | None:
+    """
+    Год регистрации из номера дела («…/23» -> 2023, «…/2023»); None — года в номере нет.
+    Две цифры больше текущего года — прошлый век («…/99» -> 1999), а не будущее.
+    Год вне CASE_YEAR_MIN..текущий («…/5678», «…/85») — тоже None: по такому номеру
+    секции не отсекаются, чтобы не потерять существующее дело.
+    """
+    m = CASE_YEAR_RE.search(case_number.strip()) if case_number else None
+    if m is None:
+        return None
+    year = int(m.group(1))
+    this_year = datetime.date.today().year
+    if year < 100:
+        year += 2000 if year <= this_year % 100 else 1900
+    return year if CASE_YEAR_MIN <= year <= this_year else None
+
+
+class Federation(sqlite3.Connection):
+    """
+    Соединение поверх секций: основная БД в памяти, секции подключаются (ATTACH,
+    только чтение) по требованию и держатся до лимита SQLite на число подключённых,
+    дольше всех не нужные отключаются первыми. Секции опрашиваются по одной,
+    найденное копится во временной export_hits, поэтому число секций не ограничено.
+    Дело с годом Y в номере не может попасть в реестр раньше года Y, поэтому
+    секции с годом < Y для такого номера не ищутся, а если не нужны ни одному
+    номеру запроса — даже не подключаются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.partitions: List[Partition] = []
+        self._attached: "OrderedDict[str, Partition]" = OrderedDict()
+        self.create_function("case_year", 1, case_year, deterministic=True)
+
+    def _attach(self, part: Partition) -> None:
+        if part.alias in self._attached:
+            self._attached.move_to_end(part.alias)
+            return
+        if len(self._attached) >= self.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+            alias, _ = self._attached.popitem(last=False)
+            self.execute(f"DETACH DATABASE {alias}")
+        self.execute(f"ATTACH DATABASE ? AS {part.alias}", (f"{part.path.resolve().as_uri()}?mode=ro",))
+        self._attached[part.alias] = part
+        metrics.count("federation.attach")
+
+    def query_case_rows(self, numbers: Iterable[str]) -> sqlite3.Cursor:
+        """
+        Строки выгрузки по номерам дел сразу по всем секциям, тем же форматом и
+        в том же порядке номеров, что query_case_rows для одной БД.
+        """
+        min_year = None
+        any_without_year = False
+
+        def track(items: Iterable[str]) -> Iterator[tuple]:
+            nonlocal min_year, any_without_year
+            for n in items:
+                key = case_number_key(n)
+                year = case_year(key)
+                if year is None:
+                    any_without_year = True
+                elif min_year is None or year < min_year:
+                    min_year = year
+                yield n, key
+
+        cur = self.cursor()
+        cur.execute("BEGIN")
+        cur.execute("DELETE FROM export_numbers")
+        cur.execute("DELETE FROM export_hits")
+        cur.executemany(data_base__12, track(numbers))
+        cur.execute("COMMIT")
+
+        skipped = 0
+        for i, part in enumerate(self.partitions):
+            if not any_without_year and (min_year is None or part.year < min_year):
+                skipped += 1
+                continue
+            self._attach(part)
+            cur.execute(data_base__23.format(db=part.alias, part=i, year=part.year))
+        metrics.count("federation.partitions_skipped", skipped)
+        return cur.execute(data_base__24)
+
+
+def open_federation(root: Path = PARTITIONS_DIR, partitions: List[Partition] | None = None) -> Federation:
+    """
+    Федеративное соединение только на чтение над секциями каталога root
+    (или над заданным списком partitions).
+    Схема секций не мигрируется: каждая должна быть актуальной (require_schema).
+    """
+    conn = sqlite3.connect(":memory:", uri=True, isolation_level=None, check_same_thread=False, factory=Federation)
+    conn.partitions = list_partitions(root) if partitions is None else list(partitions)
+    conn.execute(data_base__22)
+    for part in conn.partitions:
+        require_schema(part.path)
+    return conn
@@ -0,0 +1,14 @@
+from __future__ import annotations
+from hashlib import blake2b
+
+_SEP = "\x1f"
+
+
+def event_fingerprint(stage_date, stage_name, cause_result, cause_dep) -> int:
+    """
+    Стабильный 64-битный отпечаток события дела (знаковый — помещается в INTEGER SQLite).
+    Считается по текстовым значениям, а не по id словарей, поэтому одинаков в любой БД;
+    None приравнивается к пустой строке, как в sv().
+    """
+    key = _SEP.join(v or "" for v in (stage_date, stage_name, cause_result, cause_dep))
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
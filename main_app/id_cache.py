@@ -0,0 +1,85 @@
+from __future__ import annotations
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from main_app.constants import CASE_CACHE_SIZE
+
+CaseKey = Tuple[int, str]     # (court_id, case_number)
+
+
+class IdCache:
+    """
+    Кэш id на весь прогон синхронизации: справочники судей, судов и словаря
+    событий целиком (прогреваются из judges/courts/vocab при старте) и LRU
+    ограниченного размера для (court_id, case_number) -> id.
+    Закоммиченные id в БД не меняются, поэтому между CSV кэш не сбрасывается; после
+    отката транзакции его нужно сбросить (reset): id вставленных в ней строк SQLite
+    выдаст заново другим судьям и делам (DbSession.rollback делает это сам).
+    """
+
+    def __init__(self, case_capacity: int = CASE_CACHE_SIZE):
+        self.judges: Dict[str, int] = {}
+        self.courts: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self.cases: "OrderedDict[CaseKey, int]" = OrderedDict()
+        self.case_capacity = case_capacity
+        self.judge_hits = 0
+        self.judge_misses = 0
+        self.case_hits = 0
+        self.case_misses = 0
+
+    def warm(self, conn: sqlite3.Connection) -> None:
+        self.judges.update((name, int(jid)) for name, jid in conn.execute("SELECT name, id FROM judges"))
+        self.courts.update((name, int(cid)) for name, cid in conn.execute("SELECT name, id FROM courts"))
+        self.vocab.update((value, int(vid)) for value, vid in conn.execute("SELECT value, id FROM vocab"))
+
+    def reset(self, conn: sqlite3.Connection) -> None:
+        """После отката: в кэше могли остаться id строк, которых в БД больше нет."""
+        self.judges.clear()
+        self.courts.clear()
+        self.vocab.clear()
+        self.cases.clear()
+        self.warm(conn)
+
+    def missing_judges(self, names: Iterable[str]) -> List[str]:
+        missing = []
+        for name in dict.fromkeys(names):
+            if name in self.judges:
+                self.judge_hits += 1
+            else:
+                self.judge_misses += 1
+                missing.append(name)
+        return missing
+
+    def lookup_cases(self, keys: Iterable[CaseKey]) -> Tuple[Dict[CaseKey, int], List[CaseKey]]:
+        found: Dict[CaseKey, int] = {}
+        missing: List[CaseKey] = []
+        for key in dict.fromkeys(keys):
+            cid = self.cases.get(key)
+            if cid is None:
+                self.case_misses += 1
+                missing.append(key)
+            else:
+                self.cases.move_to_end(key)
+                self.case_hits += 1
+                found[key] = cid
+        return found, missing
+
+    def put_cases(self, ids: Dict[CaseKey, int]) -> None:
+        for key, cid in ids.items():
+            self.cases[key] = cid
+            self.cases.move_to_end(key)
+        while len(self.cases) > self.case_capacity:
+            self.cases.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "judge_hits": self.judge_hits,
+            "judge_misses": self.judge_misses,
+            "case_hits": self.case_hits,
+            "case_misses": self.case_misses,
+            "cases_cached": len(self.cases),
+            "courts": len(self.courts),
+            "vocab": len(self.vocab),
+        }
@@ -1,156 +1,196 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, Future
 from pathlib import Path
-import re
-import sqlite3
+import codecs
+import csv
 import pandas as pd
 
-from typing import Optional, Iterable, Tuple, Dict
+from typing import IO, Callable, Iterator, Tuple, Type, Union
 
 from main_app.constants import (
     PREFERRED_ENCODINGS,
-    reg__1,
-    reg__2,
-    data_base__2,
-    data_base__3,
-    data_base__4,
-    rename_map,
+    CSV_SAMPLE_BYTES,
+    CSV_CHUNK_ROWS,
 )
-from main_app.db import init_db, get_conn
+from main_app.bulk_writer import CaseBatch
+from main_app.db import DbSession
+from main_app.metrics import metrics
+from main_app.normalize import frame_columns, normalize_columns, normalize_frame_columns
 
 
-def sv(x) -> str:
-    if isinstance(x, str):
-        s = x.strip()
-        return s
-    if x is None or (isinstance(x, float) and pd.isna(x)):
-        return ""
-    try:
-        return str(x).strip()
-    except Exception:
-        return ""
-
-
-def parse_date_ddmmyyyy(val: str) -> Optional[str]:
-    v = val.strip().strip('"').strip()
-    if not v or v in {"-", "—"}:
-        return None
-    m = re.match(reg__1, v)
-    if not m:
-        return None
-    dd, mm, yyyy = m.groups()
-    return f"{yyyy}-{mm}-{dd}"
-
+# путь к CSV на диске или фабрика бинарного потока (например, член ZIP-архива)
+CsvSource = Union[Path, Callable[[], IO[bytes]]]
 
-def parse_one_role_name(s) -> Optional[Tuple[str, str]]:
-    s = sv(s)
-    if not s:
-        return None
-    m = reg__2.match(s)
-    if m:
-        return sv(m.group(1)), sv(m.group(2))
-    return "", s
 
+def open_csv_source(source: CsvSource) -> IO[bytes]:
+    return source() if callable(source) else open(source, "rb")
 
-def split_multi(value: Optional[str]) -> Iterable[str]:
-    v = sv(value)
-    if not v:
-        return []
-    return [p for p in (sv(x) for x in v.split(";")) if p]
 
-
-def read_csv_auto(csv_path: Path) -> pd.DataFrame:
+def sniff_csv(sample: bytes) -> Tuple[str, Type[csv.Dialect]]:
+    """
+    Определяет кодировку и диалект CSV по префиксу файла.
+    Кодировки перебираются в порядке PREFERRED_ENCODINGS; разделитель ищется
+    так же, как это делает pandas при sep=None (csv.Sniffer по строке заголовка).
+    """
     last_err = None
     for enc in PREFERRED_ENCODINGS:
         try:
-            return pd.read_csv(
-                csv_path,
+            # final=False: префикс может обрываться посреди многобайтового символа
+            text = codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+        except UnicodeDecodeError as e:
+            last_err = e
+            continue
+        lines = text.splitlines()
+        if not lines:
+            last_err = ValueError("пустой файл")
+            continue
+        try:
+            return enc, csv.Sniffer().sniff(lines[0])
+        except csv.Error as e:
+            last_err = e
+    raise RuntimeError(f"Не удалось определить кодировку/разделитель: {last_err}")
+
+
+def iter_csv_chunks(
+    source: CsvSource,
+    chunksize: int = CSV_CHUNK_ROWS,
+    name: str | None = None,
+    skip_rows: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Потоковое чтение CSV: кодировка и разделитель определяются один раз по
+    первым CSV_SAMPLE_BYTES байтам, дальше файл читается C-парсером pandas
+    пачками по chunksize строк — память не зависит от размера файла.
+    Если дальше префикса встретились байты не в этой кодировке (ASCII/UTF-8 в начале,
+    cp1251 потом), чтение продолжается со следующей из PREFERRED_ENCODINGS —
+    с первой записи, ещё не отданной вызывающему.
+    source — путь или фабрика потока: для члена ZIP данные распаковываются на лету.
+    skip_rows — пропустить первые записи (продолжение с контрольной точки): парсер
+    их только токенизирует, в DataFrame они не попадают.
+    """
+    with open_csv_source(source) as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+    try:
+        enc, dialect = sniff_csv(sample)
+    except RuntimeError as e:
+        raise RuntimeError(f"Не удалось прочитать {name or source}: {e}") from None
+
+    encodings = PREFERRED_ENCODINGS[PREFERRED_ENCODINGS.index(enc):]
+    for i, enc in enumerate(encodings):
+        skip = skip_rows
+        try:
+            with open_csv_source(source) as f, pd.read_csv(
+                f,
                 encoding=enc,
-                sep=None,
-                engine="python",
+                # из диалекта берётся только разделитель, как у pandas при sep=None:
+                # по строке заголовка Sniffer не видит кавычек и выключает doublequote
+                sep=dialect.delimiter,
+                engine="c",
                 dtype=str,
                 keep_default_na=False,
-                na_filter=False
-            )
-        except Exception as e:
-            last_err = e
-    raise RuntimeError(f"Не удалось прочитать {csv_path}: {last_err}")
-
-
-def upsert_case(cur: sqlite3.Cursor, row: dict) -> int:
-    cur.execute(data_base__2, (
-            sv(row.get("court_name")),
-            sv(row.get("case_number")),
-            parse_date_ddmmyyyy(sv(row.get("registration_date"))),
-            sv(row.get("type")),
-            sv(row.get("description")),
-        )
-    )
-    cur.execute(
-        "SELECT id FROM cases WHERE court_name=? AND case_number=?",
-        (sv(row.get("court_name")), sv(row.get("case_number")))
-    )
-    return int(cur.fetchone()[0])
-
-
-def upsert_judge(cur: sqlite3.Cursor, name: str) -> int:
-    name = name.strip()
-    if not name:
-        raise ValueError("empty judge name")
-    cur.execute("INSERT INTO judges(name) VALUES (?) ON CONFLICT(name) DO NOTHING", (name,))
-    cur.execute("SELECT id FROM judges WHERE name=?", (name,))
-    return int(cur.fetchone()[0])
-
-def link_case_judge(cur: sqlite3.Cursor, case_id: int, judge_id: int, role: str) -> None:
-    cur.execute(data_base__3, (case_id, judge_id, (role or "").strip()))
-
-
-def upsert_event(cur: sqlite3.Cursor, case_id: int, row: dict) -> None:
-    stage_date = parse_date_ddmmyyyy(sv(row.get("stage_date"))) or ""
-    cur.execute(data_base__4, (
-        case_id,
-        sv(row.get("case_proc")),
-        stage_date,
-        sv(row.get("stage_name")),
-        sv(row.get("cause_result")),
-        sv(row.get("cause_dep")),
-    ))
-
-
-def import_csv_to_db(csv_path: Path, db_path: Path) -> None:
-    init_db(db_path)
-    df = read_csv_auto(csv_path)
-
-    with get_conn(db_path) as conn:
-        cur = conn.cursor()
-        cache_judges: Dict[str, int] = {}
-
-        for _, r in df.iterrows():
-            row = {k: r.get(k) if k in r else None for k in rename_map.keys()}
-
-            if not row["court_name"] or not row["case_number"]:
-                continue
-
-            case_id = upsert_case(cur, row)
-
-            if row.get("judge"):
-                rn = parse_one_role_name(str(row["judge"]))
-                if rn:
-                    role, name = rn
-                    if name:
-                        if name not in cache_judges:
-                            cache_judges[name] = upsert_judge(cur, name)
-                        link_case_judge(cur, case_id, cache_judges[name], role)
-
-            if row.get("judges"):
-                for chunk in split_multi(str(row["judges"])):
-                    rn = parse_one_role_name(chunk)
-                    if rn:
-                        role, name = rn
-                        if name:
-                            if name not in cache_judges:
-                                cache_judges[name] = upsert_judge(cur, name)
-                            link_case_judge(cur, case_id, cache_judges[name], role)
-
-            upsert_event(cur, case_id, row)
-
-        conn.commit()
+                na_filter=False,
+                # записи, а не строки файла: многострочные значения в кавычках считаются верно
+                skiprows=(lambda r: 0 < r <= skip) if skip else None,
+                chunksize=chunksize,
+            ) as reader:
+                for df in reader:
+                    metrics.count("csv.rows_parsed", len(df))
+                    skip_rows += len(df)
+                    yield df
+            return
+        except UnicodeDecodeError as e:
+            if i + 1 == len(encodings):
+                raise RuntimeError(f"Не удалось прочитать {name or source}: {e}") from None
+            print(f"[WARN] {name or source}: после записи {skip_rows} не {enc} ({e.reason}), "
+                  f"дальше читаем как {encodings[i + 1]}")
+            metrics.count("csv.encoding_fallbacks")
+
+
+def iter_normalized_batches(
+    source: CsvSource,
+    name: str | None = None,
+    executor: Executor | None = None,
+    prefetch: int = 4,
+    skip_rows: int = 0,
+) -> Iterator[Tuple[int, CaseBatch]]:
+    """
+    Готовые к записи столбцовые пачки в порядке файла: (записей CSV прочитано, пачка) —
+    строки без суда/номера в пачку не попадают, но позицию в файле сдвигают.
+    CSV читается C-парсером в текущем процессе; с executor (пул процессов)
+    нормализация пачек идёт параллельно, в полёте не больше prefetch пачек.
+    """
+    chunks = iter_csv_chunks(source, name=name, skip_rows=skip_rows)
+    if executor is None:
+        for df in chunks:
+            yield len(df), normalize_frame_columns(df)
+        return
+
+    inflight: deque[Tuple[int, Future]] = deque()
+    try:
+        for df in chunks:
+            inflight.append((len(df), executor.submit(normalize_columns, frame_columns(df))))
+            if len(inflight) >= max(1, prefetch):
+                rows, fut = inflight.popleft()
+                yield rows, fut.result()
+        while inflight:
+            rows, fut = inflight.popleft()
+            yield rows, fut.result()
+    finally:
+        for _, fut in inflight:
+            fut.cancel()
+
+
+def import_csv_to_db(
+    csv_path: CsvSource,
+    db_path: Path,
+    name: str | None = None,
+    executor: Executor | None = None,
+    prefetch: int = 4,
+    session: DbSession | None = None,
+    skip_rows: int = 0,
+    checkpoint: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Импортирует CSV в БД, возвращает число записанных строк.
+    Соединение с SQLite держит только текущий процесс; воркеры executor
+    присылают уже нормализованные кортежи. session — открытая на весь прогон
+    DbSession (общий кэш id, профиль, пакетные коммиты); без неё открывается
+    сессия на один файл.
+    checkpoint(rows) вызывается при каждом коммите сессии, в его транзакции, с числом
+    записей CSV, вошедших в коммит; skip_rows — продолжить с такой контрольной точки.
+    """
+    if session is None:
+        with DbSession(db_path) as own:
+            return import_csv_to_db(csv_path, db_path, name=name, executor=executor, prefetch=prefetch,
+                                    session=own, skip_rows=skip_rows, checkpoint=checkpoint)
+
+    if skip_rows:
+        print(f"[RESUME] {name or csv_path}: продолжаем с записи {skip_rows + 1}")
+        metrics.count("import.rows_resumed", skip_rows)
+    written = 0
+    rows_done = skip_rows
+    if checkpoint is not None:
+        session.on_commit = lambda: checkpoint(rows_done)
+    try:
+        batches = iter_normalized_batches(csv_path, name=name, executor=executor, prefetch=prefetch, skip_rows=skip_rows)
+        while True:
+            with metrics.timer("csv.parse"):
+                item = next(batches, None)
+            if item is None:
+                break
+            rows_read, batch = item
+            # до write: коммит внутри неё уже включает эту пачку
+            rows_done += rows_read
+            with metrics.timer("db.write", rows=len(batch)):
+                stats = session.write(batch)
+            written += len(batch)
+            metrics.count("db.rows", len(batch))
+            for key, value in stats.items():
+                metrics.count(f"db.{key}", value)
+
+        # конец CSV — всегда граница транзакции: манифест отмечает только закоммиченное
+        session.commit()
+    finally:
+        session.on_commit = None
+    return written
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import glob
+import multiprocessing
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from main_app.config import iter_zip_csv_members
+from main_app.db import DbSession
+from main_app.import_csv_to_db import CsvSource, import_csv_to_db
+from main_app.manifest import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_IN_PROGRESS,
+    Manifest,
+    file_hash,
+    member_hash,
+)
+from main_app.metrics import metrics
+from main_app.paths import DB_PATH
+
+LOCAL_SUFFIXES = (".zip", ".csv")
+
+
+def import_members(
+    members: Iterable[Tuple[str, str, CsvSource]],
+    url: str,
+    db_path: Path,
+    manifest: Manifest,
+    parse_pool: Executor | None,
+    workers: int,
+    session: DbSession,
+) -> bool:
+    """
+    Импортирует CSV источника url: (имя члена, хэш содержимого, путь/фабрика потока).
+    True — все CSV импортированы (или уже были в БД).
+    Недоимпортированный прошлым запуском CSV продолжается с контрольной точки;
+    при ошибке незакоммиченная часть откатывается, закоммиченная остаётся вместе с позицией.
+    """
+    ok = True
+    for member, content_hash, source in members:
+        csv_name = Path(member).name
+        if manifest.member_done(content_hash):
+            print(f"[SKIP] {csv_name}: уже импортирован")
+            metrics.count("import.csv_skipped")
+            continue
+
+        skip_rows = manifest.member_progress(url, member, content_hash)
+        manifest.set_member(url, member, content_hash, None, STATUS_IN_PROGRESS)
+        try:
+            with metrics.timer("import.csv", csv=member):
+                rows = import_csv_to_db(
+                    source, db_path, name=csv_name, executor=parse_pool, prefetch=2 * workers, session=session,
+                    skip_rows=skip_rows, checkpoint=partial(manifest.set_progress, url, member),
+                )
+            # row_count — весь CSV, включая записи, закоммиченные прерванным запуском
+            manifest.set_member(url, member, content_hash, skip_rows + rows, STATUS_DONE)
+            print(f"[DB] Импортировано в БД: {csv_name}")
+        except Exception as e:
+            ok = False
+            session.rollback()
+            manifest.set_member(url, member, content_hash, None, STATUS_FAILED)
+            print(f"[ERR] Импорт {csv_name} в БД: {e}")
+    return ok
+
+
+def import_zip(
+    zip_path: Path,
+    url: str,
+    db_path: Path,
+    manifest: Manifest,
+    parse_pool: Executor | None,
+    workers: int,
+    session: DbSession,
+) -> bool:
+    """Импортирует CSV архива (см. import_members); True — все CSV импортированы."""
+    # CSV читаются прямо из ZIP: распакованные данные на диск не пишутся
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        members = [(info.filename, member_hash(info), opener) for info, opener in iter_zip_csv_members(zf)]
+        print(f"[✓] Открыт архив: {zip_path.name} ({len(members)} CSV)")
+        return import_members(members, url, db_path, manifest, parse_pool, workers, session)
+
+
+def iter_local_sources(patterns: Iterable[str]) -> Iterator[Path]:
+    """ZIP и CSV по путям: файл, каталог (рекурсивно) или glob-шаблон; без повторов, по порядку имён."""
+    seen = set()
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            found = sorted(x for x in p.rglob("*") if x.suffix.lower() in LOCAL_SUFFIXES)
+        elif p.is_file():
+            found = [p]
+        else:
+            found = sorted(Path(x) for x in glob.glob(pattern, recursive=True))
+        for path in found:
+            key = path.resolve()
+            if key in seen or not path.is_file() or path.name.startswith("._"):
+                continue
+            if path.suffix.lower() not in LOCAL_SUFFIXES:
+                continue
+            seen.add(key)
+            yield path
+
+
+def ingest_local(
+    patterns: List[str],
+    db_path: Path = DB_PATH,
+    workers: int = 1,
+    db_profile: str = "incremental",
+    commit_rows: int | None = None,
+    commit_seconds: float | None = None,
+    fts: bool = False,
+) -> bool:
+    """
+    Импорт уже скачанных ZIP/CSV тем же конвейером, что и rospakovka, без сети:
+    манифест (пропуск импортированного по хэшу содержимого), контрольные точки,
+    пул процессов нормализации. Источник в манифесте — file:// URI, файлы не удаляются.
+    True — все найденные файлы импортированы.
+    """
+    sources = list(iter_local_sources(patterns))
+    if not sources:
+        print(f"[WARN] Не найдено ZIP/CSV: {' '.join(patterns)}")
+        return False
+
+    session = DbSession(db_path, profile=db_profile, commit_rows=commit_rows, fts=fts,
+                        commit_seconds=commit_seconds).open()
+    manifest = Manifest(session.conn)
+    parse_pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) if workers > 1 else None
+
+    all_ok = True
+    try:
+        for path in sources:
+            url = path.resolve().as_uri()
+            size = path.stat().st_size
+            manifest.set_archive(url, None, None, size, STATUS_IN_PROGRESS)
+            try:
+                with metrics.timer("import.archive", url=url), metrics.profile("import", path.name):
+                    if path.suffix.lower() == ".zip":
+                        ok = import_zip(path, url, db_path, manifest, parse_pool, workers, session)
+                    else:
+                        ok = import_members([(path.name, file_hash(path), path)], url, db_path,
+                                            manifest, parse_pool, workers, session)
+            except Exception as e:
+                ok = False
+                session.rollback()
+                print(f"[ERR] Не удалось обработать {path}: {e}")
+            manifest.set_archive(url, None, None, size, STATUS_DONE if ok else STATUS_FAILED)
+            all_ok = all_ok and ok
+    except BaseException:
+        # Ctrl+C или ошибка вне импорта файла: незакоммиченная пачка не должна попасть в БД
+        session.close(commit=False)
+        raise
+    finally:
+        session.close()
+        for key, value in session.id_cache.stats().items():
+            metrics.count(f"cache.{key}", value)
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
+
+    print(f"Готово: импортировано файлов {len(sources)}. БД: {db_path}")
+    print(metrics.summary())
+    return all_ok
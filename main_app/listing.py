@@ -0,0 +1,145 @@
+from __future__ import annotations
+import threading
+import time
+from html.parser import HTMLParser
+from typing import List, Tuple
+from urllib.parse import urljoin, urlparse
+
+from main_app.constants import DATE_RE
+
+# сколько узлов (сама ссылка + предки) проверяется на дату, как в прежнем extract_date_from_context
+DATE_CONTEXT_DEPTH = 6
+
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+})
+
+
+class _Frame:
+    __slots__ = ("tag", "seq", "date", "links")
+
+    def __init__(self, tag: str, seq: int):
+        self.tag = tag
+        self.seq = seq                    # порядковый номер открывающего тега
+        self.date: str | None = None     # первая дата в тексте поддерева
+        self.links: List[_Link] = []     # ссылки, ждущие дату от этого узла
+
+
+class _Link:
+    __slots__ = ("href", "date", "level", "prev")
+
+    def __init__(self, href: str, prev: _Frame | None):
+        self.href = href
+        self.date: str | None = None
+        self.level = 0
+        # последний по открывающему тегу узел с датой, начатый до ссылки (аналог find_previous)
+        self.prev = prev
+
+
+class ListingScanner(HTMLParser):
+    """
+    Однопроходный разбор страницы листинга: каждой ZIP-ссылке сопоставляется
+    первая дата dd.mm.yyyy из текста ближайшего (до DATE_CONTEXT_DEPTH уровней)
+    узла-предка, иначе — дата ближайшего предшествующего узла с датой
+    (как find_previous в прежнем extract_date_from_context). Каждый узел получает
+    дату не более одного раза, поэтому разбор линейный.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[_Frame] = []
+        self.links: List[_Link] = []
+        self.prev_dated: _Frame | None = None
+        self.seq = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self.seq += 1
+        frame = _Frame(tag, self.seq)
+        self.stack.append(frame)
+        if tag != "a":
+            return
+        href = dict(attrs).get("href")
+        if href and (urlparse(href).path or "").lower().endswith(".zip"):
+            link = _Link(href, self.prev_dated)
+            self.links.append(link)
+            frame.links.append(link)
+
+    def handle_data(self, data):
+        m = DATE_RE.search(data)
+        if not m or not self.stack:
+            return
+        date = m.group(1)
+        top = self.stack[-1]
+        if self.prev_dated is None or top.seq > self.prev_dated.seq:
+            self.prev_dated = top
+        # узлы без даты всегда образуют вершину стека
+        for frame in reversed(self.stack):
+            if frame.date is not None:
+                break
+            frame.date = date
+
+    def handle_endtag(self, tag):
+        if not any(f.tag == tag for f in self.stack):
+            return
+        while self.stack:
+            frame = self.stack.pop()
+            self._resolve(frame)
+            if frame.tag == tag:
+                break
+
+    def close(self):
+        super().close()
+        while self.stack:
+            self._resolve(self.stack.pop())
+        for link in self.links:
+            if link.date is None and link.prev is not None:
+                link.date = link.prev.date
+
+    def _resolve(self, frame: _Frame) -> None:
+        if not frame.links:
+            return
+        parent = self.stack[-1] if self.stack else None
+        for link in frame.links:
+            if link.level < DATE_CONTEXT_DEPTH:
+                # ближний контекст: сама ссылка и её предки
+                if frame.date is not None:
+                    link.date = frame.date
+                    continue
+            elif link.prev is not None and frame.seq < link.prev.seq:
+                # дальний предок начат раньше предшествующего узла с датой
+                link.date = link.prev.date
+                continue
+            elif frame.date is not None:
+                link.date = frame.date
+                continue
+            link.level += 1
+            if parent is not None:
+                parent.links.append(link)
+
+
+def scan_listing_page(html: str, page_url: str) -> List[Tuple[str, str | None]]:
+    """ZIP-ссылки страницы в порядке документа: (абсолютный URL, дата dd.mm.yyyy или None)."""
+    scanner = ListingScanner()
+    scanner.feed(html)
+    scanner.close()
+    return [(urljoin(page_url, link.href), link.date) for link in scanner.links]
+
+
+class RateLimiter:
+    """Не чаще rate запросов в секунду суммарно по всем потокам."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,354 @@
+from __future__ import annotations
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http import HTTPStatus
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from main_app.bonus.export_cases_by_numbers import OUTPUT_COLUMNS, open_readonly, query_case_rows
+from main_app.constants import (
+    LOOKUP_CACHE_SIZE,
+    LOOKUP_CACHE_TTL,
+    LOOKUP_HOST,
+    LOOKUP_MAX_BODY_BYTES,
+    LOOKUP_MAX_NUMBERS,
+    LOOKUP_POOL_SIZE,
+    LOOKUP_PORT,
+)
+from main_app.db import require_schema
+from main_app.federation import Partition, list_partitions
+from main_app.metrics import metrics
+from main_app.text import case_number_key, sv
+
+
+class TtlCache:
+    """
+    Ограниченный LRU-кэш строк выгрузки по номеру дела со сроком жизни ttl секунд.
+    clear() увеличивает generation: put() с устаревшим поколением игнорируется,
+    чтобы результат запроса, начатого до сброса, не вернулся в кэш.
+    """
+
+    def __init__(self, capacity: int = LOOKUP_CACHE_SIZE, ttl: float = LOOKUP_CACHE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.generation = 0
+        self._items: "OrderedDict[str, Tuple[float, List[tuple]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> List[tuple] | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, rows = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return rows
+
+    def put(self, key: str, rows: List[tuple], generation: int) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._items[key] = (time.monotonic() + self.ttl, rows)
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class LookupService:
+    """
+    Поиск дел по номерам с тем же составом полей, что у export_cases_by_numbers.
+    Пул соединений только на чтение (WAL): работает параллельно с импортом.
+    Кэш сбрасывается, как только в БД закоммичена запись из другого соединения
+    (PRAGMA data_version), и в любом случае живёт не дольше ttl.
+    db_path — каталог: поиск по секциям court_registry_<год>.db, за изменениями
+    следит отдельное соединение на каждую секцию. Список секций перечитывается
+    при каждой проверке data_version: новая секция (с актуальной схемой) или
+    удалённая сбрасывают кэш, а соединения пула переоткрываются при следующей выдаче.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        pool_size: int = LOOKUP_POOL_SIZE,
+        cache_size: int = LOOKUP_CACHE_SIZE,
+        ttl: float = LOOKUP_CACHE_TTL,
+    ):
+        self.db_path = Path(db_path)
+        if not self.db_path.is_dir():
+            require_schema(self.db_path)
+        self.pool_size = max(1, pool_size)
+        # секции, по которым сейчас ищет пул (None — один файл БД); _layout растёт при каждой смене списка
+        self._partitions: List[Partition] | None = list_partitions(self.db_path) if self.db_path.is_dir() else None
+        self._layout = 0
+        self._pool: "queue.Queue[Tuple[int, sqlite3.Connection]]" = queue.Queue()
+        for _ in range(self.pool_size):
+            self._pool.put((self._layout, open_readonly(self.db_path, self._partitions)))
+        watched = [p.path for p in self._partitions] if self._partitions is not None else [self.db_path]
+        self._watch: Dict[Path, sqlite3.Connection] = {p: open_readonly(p) for p in watched}
+        self._watch_lock = threading.Lock()
+        self._data_version = self._read_version()
+        self.cache = TtlCache(cache_size, ttl)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        layout, conn = self._pool.get()
+        try:
+            if layout != self._layout:
+                # список секций сменился: федерация открывается заново, старая — после успеха
+                with self._watch_lock:
+                    current, partitions = self._layout, self._partitions
+                fresh = open_readonly(self.db_path, partitions)
+                conn.close()
+                layout, conn = current, fresh
+            yield conn
+        finally:
+            self._pool.put((layout, conn))
+
+    def _read_version(self) -> Tuple[int, ...]:
+        return tuple(conn.execute("PRAGMA data_version;").fetchone()[0] for conn in self._watch.values())
+
+    def _relist_partitions(self) -> bool:
+        """Перечитывает каталог секций (под _watch_lock); True — список изменился."""
+        ready = []
+        for part in list_partitions(self.db_path):
+            if part not in self._partitions:
+                try:
+                    require_schema(part.path)
+                except (RuntimeError, sqlite3.Error):
+                    continue        # секцию ещё создаёт импорт: подключим, когда схема будет готова
+            ready.append(part)
+        if ready == self._partitions:
+            return False
+        for path in set(self._watch) - {p.path for p in ready}:
+            self._watch.pop(path).close()
+        for part in ready:
+            if part.path not in self._watch:
+                self._watch[part.path] = open_readonly(part.path)
+        self._watch = {p.path: self._watch[p.path] for p in ready}
+        print(f"[LOOKUP] Секции: {', '.join(str(p.year) for p in ready) or 'нет'}")
+        self._partitions = ready
+        self._layout += 1
+        return True
+
+    def _check_version(self) -> None:
+        with self._watch_lock:
+            relisted = self._partitions is not None and self._relist_partitions()
+            version = self._read_version()
+            if not relisted and version == self._data_version:
+                return
+            self._data_version = version
+        self.cache.clear()
+        metrics.count("lookup.invalidations")
+
+    def lookup(self, numbers: Iterable[str]) -> List[Dict[str, object]]:
+        wanted = list(dict.fromkeys(n for n in map(sv, numbers) if n))
+        if len(wanted) > LOOKUP_MAX_NUMBERS:
+            raise ValueError(f"не больше {LOOKUP_MAX_NUMBERS} номеров за запрос")
+        self._check_version()
+        generation = self.cache.generation
+
+        # кэш — по ключу номера: «757/1234/23» и «757 / 1234/23» делят одну запись
+        keys = {n: case_number_key(n) for n in wanted}
+        found: Dict[str, List[tuple]] = {}
+        missing: Dict[str, str] = {}
+        for n, key in keys.items():
+            if key in found or key in missing:
+                continue
+            rows = self.cache.get(key)
+            if rows is None:
+                missing[key] = n
+            else:
+                found[key] = rows
+        metrics.count("lookup.cache_hits", len(found))
+        metrics.count("lookup.cache_misses", len(missing))
+
+        if missing:
+            fetched: Dict[str, List[tuple]] = {}
+            with metrics.timer("lookup.query", numbers=len(missing)), self.connection() as conn:
+                for row in query_case_rows(conn, missing.values()):
+                    fetched.setdefault(row[1], []).append(row)
+            for key, n in missing.items():
+                found[key] = fetched.get(n, [])
+                self.cache.put(key, found[key], generation)
+
+        # case_number в ответе — как в запросе, даже если строки взяты из кэша другого написания
+        return [
+            dict(zip(OUTPUT_COLUMNS, (row[0], n) + tuple(row[2:])))
+            for n in wanted for row in found[keys[n]]
+        ]
+
+    def close(self) -> None:
+        for _ in range(self.pool_size):
+            self._pool.get()[1].close()
+        for conn in self._watch.values():
+            conn.close()
+
+
+class LookupServer:
+    """
+    HTTP/JSON поверх asyncio (keep-alive, без внешних зависимостей):
+      GET  /health
+      GET  /cases/<номер>            GET /cases?number=<номер>&number=...
+      POST /cases  {"numbers": [...]}
+    Ответ: {"rows": [...]} — по строке выгрузки на каждое найденное дело
+    (или одна строка с not_found=1). Запросы к SQLite идут в пуле потоков
+    размером с пул соединений, цикл событий не блокируется.
+    """
+
+    def __init__(self, service: LookupService, host: str = LOOKUP_HOST, port: int = LOOKUP_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=service.pool_size, thread_name_prefix="lookup")
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"[LOOKUP] Слушаем http://{self.host}:{self.port} (БД: {self.service.db_path})")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter, version: str, status: HTTPStatus, payload: object, keep_alive: bool
+    ) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"{version} {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                # разбор запроса: на мусор отвечаем 400 и закрываем соединение — тело
+                # непонятной длины не вычитать, следующий запрос не найти
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    if not version.startswith("HTTP/"):
+                        raise ValueError(version)
+                    headers = {}
+                    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(
+                        writer, "HTTP/1.1", HTTPStatus.BAD_REQUEST, {"error": "некорректный HTTP-запрос"}, False
+                    )
+                    break
+                if length > LOOKUP_MAX_BODY_BYTES:
+                    await self._respond(
+                        writer, version, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        {"error": f"тело больше {LOOKUP_MAX_BODY_BYTES} байт"}, False,
+                    )
+                    break
+                body = await reader.readexactly(length)
+
+                t0 = time.perf_counter()
+                try:
+                    status, payload = await self._route(method, target, body)
+                except Exception as e:
+                    # непредвиденная ошибка — 500, а не оборванное без ответа соединение
+                    print(f"[ERR] {method} {target}: {type(e).__name__}: {e}")
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "внутренняя ошибка сервиса"}
+                metrics.observe("lookup.request", time.perf_counter() - t0, status=int(status))
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, version, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, object]:
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/")
+        if path == "/health":
+            return HTTPStatus.OK, {"status": "ok", "cached": len(self.service.cache)}
+
+        if path == "/cases" and method == "POST":
+            try:
+                numbers = json.loads(body or b"{}").get("numbers")
+            except (ValueError, AttributeError):
+                numbers = None
+            if not isinstance(numbers, list) or not all(isinstance(n, str) for n in numbers):
+                return HTTPStatus.BAD_REQUEST, {"error": 'ожидается JSON {"numbers": ["<номер>", ...]}'}
+        elif path == "/cases" and method == "GET":
+            numbers = parse_qs(parts.query).get("number", [])
+        elif path.startswith("/cases/") and method == "GET":
+            numbers = [unquote(path[len("/cases/"):])]
+        elif path == "/cases" or path.startswith("/cases/"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"метод {method} не поддерживается"}
+        else:
+            return HTTPStatus.NOT_FOUND, {"error": f"нет такого пути: {parts.path}"}
+
+        loop = asyncio.get_running_loop()
+        try:
+            rows = await loop.run_in_executor(self._executor, self.service.lookup, numbers)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except sqlite3.Error as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": f"ошибка БД: {e}"}
+        return HTTPStatus.OK, {"rows": rows}
+
+
+def run_lookup_server(
+    db_path: Path,
+    host: str = LOOKUP_HOST,
+    port: int = LOOKUP_PORT,
+    pool_size: int = LOOKUP_POOL_SIZE,
+    cache_size: int = LOOKUP_CACHE_SIZE,
+    ttl: float = LOOKUP_CACHE_TTL,
+) -> None:
+    """Запускает сервис поиска и работает до Ctrl+C."""
+    service = LookupService(db_path, pool_size=pool_size, cache_size=cache_size, ttl=ttl)
+    server = LookupServer(service, host=host, port=port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        service.close()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import sqlite3
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, NamedTuple
+
+from main_app.constants import data_base__9, data_base__10
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+HASH_READ_BYTES = 1024 * 1024
+
+
+class ArchiveRecord(NamedTuple):
+    etag: str | None
+    last_modified: str | None
+    size: int | None
+    status: str
+
+
+def member_hash(info: zipfile.ZipInfo) -> str:
+    # CRC32 и размер берутся из central directory — хэш считается без распаковки
+    return f"{info.CRC:08x}-{info.file_size}"
+
+
+def file_hash(path: Path) -> str:
+    """Хэш CSV на диске в том же формате, что member_hash: файл, распакованный
+    из уже импортированного архива, распознаётся как импортированный."""
+    crc = 0
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_READ_BYTES):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return f"{crc:08x}-{size}"
+
+
+class Manifest:
+    """
+    Журнал загрузок в той же SQLite-БД: какие архивы (с их ETag/Last-Modified/размером)
+    и какие CSV-члены (по хэшу содержимого) уже полностью импортированы, а для
+    недоимпортированных — сколько строк закоммичено (rows_done, контрольная точка).
+    Пишется только из потока-писателя, через его же соединение (DbSession.conn).
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def load_archives(self) -> Dict[str, ArchiveRecord]:
+        rows = self.conn.execute("SELECT url, etag, last_modified, size, status FROM ingest_archives")
+        return {url: ArchiveRecord(etag, lm, size, status) for url, etag, lm, size, status in rows}
+
+    def set_archive(self, url: str, etag: str | None, last_modified: str | None,
+                    size: int | None, status: str) -> None:
+        with self.conn:
+            self.conn.execute(data_base__9, (url, etag, last_modified, size, status))
+
+    def member_done(self, content_hash: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM ingest_members WHERE content_hash=? AND status=? LIMIT 1",
+            (content_hash, STATUS_DONE),
+        ).fetchone()
+        return row is not None
+
+    def set_member(self, archive_url: str, member: str, content_hash: str,
+                   row_count: int | None, status: str) -> None:
+        with self.conn:
+            self.conn.execute(data_base__10, (archive_url, member, content_hash, row_count, status))
+
+    def member_progress(self, archive_url: str, member: str, content_hash: str) -> int:
+        """Строк CSV, закоммиченных прошлым (прерванным) импортом того же содержимого."""
+        row = self.conn.execute(
+            "SELECT rows_done FROM ingest_members WHERE archive_url=? AND member=? AND content_hash=? AND status<>?",
+            (archive_url, member, content_hash, STATUS_DONE),
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def set_progress(self, archive_url: str, member: str, rows_done: int) -> None:
+        # без коммита: позиция пишется в транзакции данных и фиксируется вместе с ними
+        self.conn.execute(
+            "UPDATE ingest_members SET rows_done=?, updated_at=datetime('now') WHERE archive_url=? AND member=?",
+            (rows_done, archive_url, member),
+        )
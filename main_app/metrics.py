@@ -0,0 +1,126 @@
+from __future__ import annotations
+import cProfile
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator, List
+
+
+class Metrics:
+    """
+    Таймеры и счётчики стадий конвейера (crawl, download, parse, write, commit ...).
+    События пишутся построчно в JSON (если задан log_path), в конце — сводная таблица.
+    Потокобезопасен: стадии загрузки идут в пуле потоков.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._log: IO[str] | None = None
+        self.profile_stage: str | None = None
+        self.profile_dir: Path | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters: Dict[str, int] = defaultdict(int)
+            self.timers: Dict[str, List[float]] = defaultdict(list)
+            self.started = time.perf_counter()
+
+    def configure(
+        self,
+        log_path: Path | None = None,
+        profile_stage: str | None = None,
+        profile_dir: Path | None = None,
+    ) -> None:
+        self.close()
+        if log_path is not None:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(log_path, "a", encoding="utf-8")
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.reset()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def event(self, event: str, **fields) -> None:
+        if self._log is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._log is not None:
+                self._log.write(line + "\n")
+                self._log.flush()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, stage: str, seconds: float, **fields) -> None:
+        with self._lock:
+            self.timers[stage].append(seconds)
+        self.event("stage", stage=stage, seconds=round(seconds, 6), **fields)
+
+    @contextmanager
+    def timer(self, stage: str, **fields) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, **fields)
+
+    @contextmanager
+    def profile(self, stage: str, label: str) -> Iterator[None]:
+        """cProfile вокруг стадии, если она выбрана --profile; статистика — в profile_dir/<stage>_<label>.prof."""
+        if self.profile_stage != stage or self.profile_dir is None:
+            yield
+            return
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            safe = re.sub(r"[^\w.-]+", "_", label)
+            out = self.profile_dir / f"{stage}_{safe}.prof"
+            prof.dump_stats(out)
+            text = io.StringIO()
+            pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(25)
+            out.with_suffix(".txt").write_text(text.getvalue(), encoding="utf-8")
+            self.event("profile", stage=stage, label=label, path=str(out))
+
+    def summary(self) -> str:
+        with self._lock:
+            timers = {k: list(v) for k, v in self.timers.items()}
+            counters = dict(self.counters)
+        wall = time.perf_counter() - self.started
+        lines = [f"{'stage':<22} {'calls':>7} {'total, s':>10} {'avg, ms':>10} {'max, ms':>10}"]
+        for stage, values in sorted(timers.items(), key=lambda kv: -sum(kv[1])):
+            total = sum(values)
+            lines.append(
+                f"{stage:<22} {len(values):>7} {total:>10.2f} "
+                f"{total / len(values) * 1000:>10.1f} {max(values) * 1000:>10.1f}"
+            )
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<22} {'value':>12}")
+            for name, value in sorted(counters.items()):
+                lines.append(f"{name:<22} {value:>12}")
+        lines.append("")
+        lines.append(f"wall time: {wall:.2f} s")
+        self.event("summary", wall_seconds=round(wall, 3), counters=counters,
+                   timers={k: round(sum(v), 6) for k, v in timers.items()})
+        return "\n".join(lines)
+
+
+metrics = Metrics()
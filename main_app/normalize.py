@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Dict
+
+import pandas as pd
+
+from main_app.bulk_writer import CaseBatch
+from main_app.constants import reg__1, reg__2, rename_map
+from main_app.fingerprint import event_fingerprint
+from main_app.text import case_number_key
+
+
+def _text(df: pd.DataFrame, col: str) -> pd.Series:
+    """trim для целого столбца; отсутствующая колонка — пустые строки."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].astype(str).str.strip()
+
+
+def _dates(s: pd.Series) -> pd.Series:
+    """Даты столбца: dd.mm.yyyy -> yyyy-mm-dd, иначе None."""
+    v = s.str.strip('"').str.strip()
+    parts = v.str.extract(reg__1)
+    iso = parts[2] + "-" + parts[1] + "-" + parts[0]
+    return iso.astype(object).where(parts[0].notna(), None)
+
+
+def _role_names(parts: pd.Series) -> pd.DataFrame:
+    """Непустые куски «роль: ПІБ» -> роль и ПІБ; без двоеточия — только ПІБ."""
+    m = parts.str.extract(reg__2)
+    matched = m[0].notna()
+    role = m[0].where(matched, "").astype(str).str.strip()
+    name = m[1].where(matched, parts).astype(str).str.strip()
+    return pd.DataFrame({"role": role, "name": name}, index=parts.index)
+
+
+def normalize_frame_columns(df: pd.DataFrame) -> CaseBatch:
+    """
+    Нормализация пачки целиком, столбцами: trim, даты dd.mm.yyyy -> ISO, разбор
+    judge и judges («роль: ПІБ» через «;»), ключи номеров, отпечатки событий. Строки без суда
+    или номера отбрасываются; судьи строки — сначала judge, затем judges по порядку.
+    """
+    if "court_name" not in df.columns or "case_number" not in df.columns:
+        return CaseBatch.empty()
+    keep = (df["court_name"].astype(str) != "") & (df["case_number"].astype(str) != "")
+    df = df.loc[keep].reset_index(drop=True)
+
+    pieces = []
+    if "judge" in df.columns:
+        judge = df["judge"].astype(str).str.strip()
+        judge = judge[judge != ""]
+        pieces.append(pd.DataFrame({"row": judge.index, "seq": 0, "part": judge.values}))
+    if "judges" in df.columns:
+        multi = df["judges"].astype(str).str.strip()
+        multi = multi[multi != ""].str.split(";").explode()
+        multi = multi.str.strip()
+        multi = multi[multi != ""]
+        pieces.append(pd.DataFrame({"row": multi.index, "seq": 1, "part": multi.values}))
+
+    if pieces:
+        links = pd.concat(pieces, ignore_index=True)
+        links = links.sort_values(["row", "seq"], kind="stable").reset_index(drop=True)
+        links = pd.concat([links, _role_names(links["part"].astype(str))], axis=1)
+        links = links[links["name"] != ""]
+        judge_row = links["row"].astype(int).tolist()
+        judge_role = links["role"].tolist()
+        judge_name = links["name"].tolist()
+    else:
+        judge_row, judge_role, judge_name = [], [], []
+
+    stage_date = _dates(_text(df, "stage_date")).fillna("").tolist()
+    stage_name = _text(df, "stage_name").tolist()
+    cause_result = _text(df, "cause_result").tolist()
+    cause_dep = _text(df, "cause_dep").tolist()
+    case_number = _text(df, "case_number").tolist()
+    # номер повторяется в каждой строке события дела: ключ считается раз на номер
+    keys = {n: case_number_key(n) for n in set(case_number)}
+
+    return CaseBatch(
+        court_name=_text(df, "court_name").tolist(),
+        case_number=case_number,
+        case_number_key=[keys[n] for n in case_number],
+        registration_date=_dates(_text(df, "registration_date")).tolist(),
+        type=_text(df, "type").tolist(),
+        description=_text(df, "description").tolist(),
+        participants=_text(df, "participants").tolist(),
+        case_proc=_text(df, "case_proc").tolist(),
+        stage_date=stage_date,
+        stage_name=stage_name,
+        cause_result=cause_result,
+        cause_dep=cause_dep,
+        event_fp=list(map(event_fingerprint, stage_date, stage_name, cause_result, cause_dep)),
+        judge_row=judge_row,
+        judge_role=judge_role,
+        judge_name=judge_name,
+    )
+
+
+def normalize_columns(columns: Dict[str, list]) -> CaseBatch:
+    """Точка входа для процессов-воркеров: столбцы пачки -> CaseBatch."""
+    return normalize_frame_columns(pd.DataFrame(columns, dtype=object))
+
+
+def frame_columns(df: pd.DataFrame) -> Dict[str, list]:
+    return {k: df[k].tolist() for k in rename_map.keys() if k in df.columns}
@@ -4,6 +4,12 @@ from typing import Final
 MAIN_DIR: Final[pathlib.Path] = pathlib.Path(__file__).resolve().parents[1]
 
 DB_PATH = MAIN_DIR / "output_dir" / "court_registry.db"
+# секционированное хранение: court_registry_<год>.db, по файлу на год реестра
+PARTITIONS_DIR = MAIN_DIR / "output_dir" / "partitions"
+# сюда докачиваются ZIP: недокачанные *.part переживают перезапуск
+DOWNLOAD_DIR = MAIN_DIR / "output_dir" / "downloads"
+# столбцовые снимки БД для аналитики: snapshot_<номер>/ с manifest.json
+SNAPSHOTS_DIR = MAIN_DIR / "output_dir" / "snapshots"
 
 BONUS__INPUT_CSV = MAIN_DIR / "input_cases.csv"
 BONUS__OUTPUT_CSV = MAIN_DIR / "output_cases.csv"
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import sqlite3
+from typing import Dict, List, Tuple
+
+from main_app.constants import (
+    ROLLUP_LIMIT,
+    data_base__27,
+    data_base__28,
+    data_base__29,
+    data_base__32,
+    data_base__33,
+    data_base__34,
+)
+from main_app.metrics import metrics
+
+# сводная таблица -> (колонки, свежий расчёт по таблицам данных)
+ROLLUPS = {
+    "rollup_judge_role": ("judge_id, role, cases", data_base__27),
+    "rollup_court_month": ("court_id, month, cases", data_base__28),
+    "rollup_stage": ("stage_name_id, cases, events", data_base__29),
+}
+
+
+def judge_case_counts(conn: sqlite3.Connection, limit: int = ROLLUP_LIMIT) -> List[Tuple[str, str, int]]:
+    """(судья, роль, дел) по убыванию числа дел."""
+    return conn.execute(data_base__32, (limit,)).fetchall()
+
+
+def court_month_counts(conn: sqlite3.Connection, limit: int = ROLLUP_LIMIT) -> List[Tuple[str, str, int]]:
+    """(суд, месяц регистрации YYYY-MM, дел); пустой месяц — дата регистрации не указана."""
+    return conn.execute(data_base__33, (limit,)).fetchall()
+
+
+def stage_case_counts(conn: sqlite3.Connection, limit: int = ROLLUP_LIMIT) -> List[Tuple[str, int, int]]:
+    """(стадия, дел с такой стадией, событий) по убыванию числа дел."""
+    return conn.execute(data_base__34, (limit,)).fetchall()
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Пересчитывает сводки с нуля по таблицам данных и заменяет ими ведущиеся при
+    импорте. Возвращает по каждой сводке число строк, расходившихся с пересчётом
+    (0 — инкрементальное ведение было точным).
+    """
+    mismatched = {}
+    with metrics.timer("rollups.rebuild"), conn:
+        for table, (columns, fresh) in ROLLUPS.items():
+            conn.execute("DROP TABLE IF EXISTS temp.rollup_fresh")
+            conn.execute(f"CREATE TEMP TABLE rollup_fresh AS SELECT {columns} FROM {table} WHERE 0")
+            conn.execute(f"INSERT INTO rollup_fresh({columns}) {fresh}")
+            mismatched[table] = conn.execute(f"""
+                SELECT (SELECT COUNT(*) FROM (SELECT {columns} FROM {table} EXCEPT SELECT {columns} FROM rollup_fresh))
+                     + (SELECT COUNT(*) FROM (SELECT {columns} FROM rollup_fresh EXCEPT SELECT {columns} FROM {table}))
+            """).fetchone()[0]
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table}({columns}) SELECT {columns} FROM rollup_fresh")
+        conn.execute("DROP TABLE temp.rollup_fresh")
+    for table, n in mismatched.items():
+        metrics.count(f"rollups.mismatched.{table}", n)
+    return mismatched
@@ -1,49 +1,192 @@
-import tempfile
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlparse
 
 import requests
 
-from main_app.config import extract_zip, iter_csv_files
-from main_app.constants import header
-from main_app.import_csv_to_db import import_csv_to_db
-from main_app.paths import DB_PATH
-from main_app.urls import download_file, iter_year_zip_links
+from main_app.constants import BASE_LIST_URL, header
+from main_app.db import DbSession
+from main_app.ingest import import_zip
+from main_app.metrics import metrics
+from main_app.manifest import STATUS_DONE, STATUS_FAILED, STATUS_IN_PROGRESS, ArchiveRecord, Manifest
+from main_app.paths import DB_PATH, DOWNLOAD_DIR
+from main_app.urls import RemoteInfo, download_file, iter_year_zip_links, probe_download, remove_download
 
+_DONE = object()
 
-def rospakovka(year: int, max_pages: int = 50, chunk_size: int = 10):
-    SESSION = requests.Session()
-    SESSION.headers.update(header)
 
-    any_found = False
-    for url in iter_year_zip_links(year, SESSION=SESSION, max_pages=max_pages):
-        any_found = True
-        try:
-            with tempfile.TemporaryDirectory(prefix="court_zip_") as tmpdir:
-                tmpdir_path = Path(tmpdir)
+class DiskBudget:
+    """
+    Мягкий лимит на объём скачанных, но ещё не импортированных архивов.
+    Новая загрузка не стартует, пока занято >= limit байт (одна загрузка разрешена всегда).
+    """
+
+    def __init__(self, limit_bytes: int | None):
+        self.limit = limit_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def wait(self) -> None:
+        if not self.limit:
+            return
+        with self._cond:
+            self._cond.wait_for(lambda: self.used == 0 or self.used < self.limit)
+
+    def add(self, n: int) -> None:
+        with self._cond:
+            self.used += n
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
 
-                # 1) скачали
-                zip_path = download_file(url, tmpdir_path, SESSION=SESSION, chunk_size=chunk_size)
+def _download_stage(
+    url: str,
+    SESSION,
+    chunk_size: int,
+    budget: DiskBudget,
+    known: ArchiveRecord | None,
+    download_dir: Path,
+) -> tuple[Path, int, RemoteInfo] | None:
+    """Скачивает архив; None — архив уже полностью импортирован и не изменился."""
+    if known is not None and known.status == STATUS_DONE:
+        info = probe_download(url, SESSION, etag=known.etag, last_modified=known.last_modified)
+        if info is None:
+            return None
+        # сервер мог проигнорировать условный запрос — сверяем валидаторы сами
+        if (info.etag or info.last_modified) and \
+                (info.etag, info.last_modified, info.size) == (known.etag, known.last_modified, known.size):
+            return None
+    else:
+        info = probe_download(url, SESSION)
 
-                # 2) распаковали
-                extracted_root = tmpdir_path / "extracted"
-                extracted_root.mkdir(parents=True, exist_ok=True)
-                out_dir = extract_zip(zip_path, extracted_root)
-                print(f"[✓] Распаковано: {zip_path.name} -> {out_dir}")
+    budget.wait()
+    with metrics.timer("download", url=url), metrics.profile("download", Path(urlparse(url).path).name):
+        zip_path = download_file(url, download_dir, SESSION=SESSION, chunk_size=chunk_size, info=info)
+    size = zip_path.stat().st_size
+    metrics.count("download.archives")
+    budget.add(size)
+    return zip_path, size, info
 
-                # 3) импортировали все CSV
-                for csv_file in iter_csv_files(out_dir):
-                    try:
-                        import_csv_to_db(csv_file, DB_PATH)
-                        print(f"[DB] Импортировано в БД: {csv_file.name}")
-                    except Exception as e:
-                        print(f"[ERR] Импорт {csv_file.name} в БД: {e}")
 
-                print(f"[CLEAN] Обработан и удалён: {zip_path.name}")
+def rospakovka(
+    year: int,
+    max_pages: int = 50,
+    chunk_size: int = 10,
+    download_workers: int = 2,
+    max_temp_mb: int | None = None,
+    workers: int = 1,
+    db_path: Path = DB_PATH,
+    download_dir: Path = DOWNLOAD_DIR,
+    list_url: str = BASE_LIST_URL,
+    db_profile: str = "incremental",
+    commit_rows: int | None = None,
+    fts: bool = False,
+    commit_seconds: float | None = None,
+):
+    """
+    Конвейер: поиск ссылок → пул загрузчиков (download_workers потоков) →
+    единственный писатель в SQLite (текущий поток). Стадии связаны ограниченной
+    очередью, поэтому загрузка архива N+1 идёт параллельно с импортом архива N.
+    max_temp_mb — мягкий лимит на объём скачанных и ещё не импортированных ZIP.
+    workers > 1 — разбор и нормализация CSV в пуле процессов, писатель остаётся один.
+    db_profile/commit_rows/commit_seconds — настройки DbSession, открытой на весь прогон
+    (bulk — для первичной заливки, incremental — для ежедневных запусков); каждый
+    коммит — контрольная точка: прерванный CSV следующий запуск продолжит с неё.
+    fts — вести полнотекстовый индекс по description/participants (search.py).
+    Манифест в БД позволяет пропускать неизменившиеся архивы (условный запрос
+    по ETag/Last-Modified) и уже импортированные CSV (по хэшу содержимого).
+    """
+    SESSION = requests.Session()
+    SESSION.headers.update(header)
 
+    session = DbSession(db_path, profile=db_profile, commit_rows=commit_rows, fts=fts, commit_seconds=commit_seconds).open()
+    manifest = Manifest(session.conn)
+    known = manifest.load_archives()
+    # spawn: пул создаётся рядом с потоками загрузчиков, fork в таком процессе небезопасен
+    parse_pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) if workers > 1 else None
+
+    download_workers = max(1, download_workers)
+    budget = DiskBudget(max_temp_mb * 1024 * 1024 if max_temp_mb else None)
+    # очередь хранит Future в порядке ссылок: писатель импортирует архивы в том же порядке
+    pending: "queue.Queue[tuple[str, Future] | object]" = queue.Queue(maxsize=download_workers)
+    stop = threading.Event()
+    any_found = False
+
+    def produce(pool: ThreadPoolExecutor) -> None:
+        nonlocal any_found
+        try:
+            for url in iter_year_zip_links(year, SESSION=SESSION, max_pages=max_pages, list_url=list_url):
+                if stop.is_set():
+                    break
+                any_found = True
+                pending.put((url, pool.submit(_download_stage, url, SESSION, chunk_size, budget, known.get(url), download_dir)))
         except Exception as e:
-            print(f"[ERR] Не удалось обработать {url}: {e}")
+            print(f"[ERR] Поиск архивов за {year}: {e}")
+        finally:
+            pending.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="download") as pool:
+        producer = threading.Thread(target=produce, args=(pool,), name="crawler", daemon=True)
+        producer.start()
+        try:
+            while (item := pending.get()) is not _DONE:
+                url, fut = item
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    print(f"[ERR] Не удалось обработать {url}: {e}")
+                    continue
+                if result is None:
+                    print(f"[SKIP] Архив не изменился: {url}")
+                    metrics.count("download.archives_unchanged")
+                    continue
+                zip_path, size, info = result
+                manifest.set_archive(url, info.etag, info.last_modified, info.size, STATUS_IN_PROGRESS)
+                try:
+                    with metrics.timer("import.archive", url=url), metrics.profile("import", zip_path.name):
+                        ok = import_zip(zip_path, url, db_path, manifest, parse_pool, workers, session)
+                    manifest.set_archive(url, info.etag, info.last_modified, info.size,
+                                         STATUS_DONE if ok else STATUS_FAILED)
+                    print(f"[CLEAN] Обработан и удалён: {zip_path.name}")
+                except Exception as e:
+                    # манифест коммитит своё соединение: незаписанная часть архива в него не попадёт
+                    session.rollback()
+                    manifest.set_archive(url, info.etag, info.last_modified, info.size, STATUS_FAILED)
+                    print(f"[ERR] Не удалось обработать {url}: {e}")
+                finally:
+                    remove_download(zip_path)
+                    budget.release(size)
+        except BaseException:
+            # Ctrl+C или ошибка вне импорта архива: незакоммиченная пачка не должна попасть в БД
+            session.close(commit=False)
+            raise
+        finally:
+            stop.set()
+            # разблокировать производителя; уже скачанные ZIP остаются в download_dir
+            # и будут переиспользованы download_file при следующем запуске
+            while producer.is_alive() or not pending.empty():
+                try:
+                    item = pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is not _DONE:
+                    item[1].cancel()
+            session.close()
+            for key, value in session.id_cache.stats().items():
+                metrics.count(f"cache.{key}", value)
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
 
     if not any_found:
         print(f"[WARN] Не найдено архивов за {year}")
     else:
-        print(f"Готово: распаковка и импорт CSV выполнены. БД: {DB_PATH}")
\ No newline at end of file
+        print(f"Готово: распаковка и импорт CSV выполнены. БД: {db_path}")
+    print(metrics.summary())
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import re
+import sqlite3
+from typing import List, NamedTuple
+
+from main_app.constants import SEARCH_LIMIT, data_base__16, data_base__17, data_base__19
+from main_app.metrics import metrics
+
+SEARCH_COLUMNS = ("description", "participants")
+_TOKEN_RE = re.compile(r"\w+\*?")
+
+
+class SearchHit(NamedTuple):
+    case_id: int
+    court_name: str
+    case_number: str
+    score: float          # bm25: чем меньше, тем релевантнее
+
+
+def search_enabled(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='case_search'"
+    ).fetchone() is not None
+
+
+def enable_search(conn: sqlite3.Connection) -> int:
+    """
+    Создаёт FTS5-индекс case_search и заполняет его описаниями уже загруженных дел.
+    Участники в БД не хранились, поэтому для старых дел индексируется только description;
+    новые дела импорт добавляет вместе с participants. Возвращает число проиндексированных дел.
+    """
+    if search_enabled(conn):
+        return 0
+    with metrics.timer("search.enable"), conn:
+        conn.execute(data_base__16)
+        rows = conn.execute(data_base__17).rowcount
+    print(f"[FTS] Создан полнотекстовый индекс, дел: {rows}")
+    return rows
+
+
+def to_fts_query(text: str, column: str | None = None) -> str:
+    """
+    Пользовательский текст -> запрос FTS5: каждое слово в кавычках (знаки
+    препинания в именах не ломают синтаксис), слова через AND; «слово*» — префикс.
+    """
+    if column is not None and column not in SEARCH_COLUMNS:
+        raise ValueError(f"поиск возможен только по {', '.join(SEARCH_COLUMNS)}")
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        word, star = (token[:-1], "*") if token.endswith("*") else (token, "")
+        terms.append(f'"{word}"{star}')
+    if not terms:
+        raise ValueError("пустой поисковый запрос")
+    query = " AND ".join(terms)
+    return f"{column} : ({query})" if column else query
+
+
+def search_cases(
+    conn: sqlite3.Connection,
+    text: str,
+    limit: int = SEARCH_LIMIT,
+    column: str | None = None,
+    raw: bool = False,
+) -> List[SearchHit]:
+    """
+    Дела, у которых description/participants совпадают с запросом, по убыванию
+    релевантности (bm25). raw=True — text передаётся в MATCH как есть (синтаксис FTS5).
+    """
+    if not search_enabled(conn):
+        raise RuntimeError("полнотекстовый индекс не создан: импорт с --fts или enable_search()")
+    query = text if raw else to_fts_query(text, column)
+    with metrics.timer("search.query"):
+        return [SearchHit(*row) for row in conn.execute(data_base__19, (query, limit))]
@@ -0,0 +1,252 @@
+from __future__ import annotations
+import json
+import re
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+from main_app.constants import SNAPSHOT_CHUNK_ROWS, SNAPSHOT_TABLES, data_base__37, data_base__38
+from main_app.db import require_schema
+from main_app.federation import list_partitions
+from main_app.metrics import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # pyarrow необязателен: без него — сжатые npz
+    pa = pq = None
+
+SNAPSHOT_FORMATS = ("auto", "parquet", "npz")
+SNAPSHOT_RE = re.compile(r"^snapshot_(\d{5})$")
+MANIFEST_NAME = "manifest.json"
+
+
+class Column(NamedTuple):
+    name: str
+    integer: bool       # INTEGER-аффинность: int64, иначе строка UTF-8
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[Column]:
+    """Колонки таблицы в порядке схемы; тип — по правилам аффинности SQLite."""
+    info = conn.execute(f"PRAGMA table_info({table})")
+    return [Column(name, "INT" in (decl or "").upper()) for _, name, decl, *_ in info]
+
+
+def last_snapshot(out_dir: Path) -> Dict[str, object] | None:
+    """manifest.json последнего завершённого снимка каталога out_dir (None — снимков нет)."""
+    if not out_dir.is_dir():
+        return None
+    done = sorted(p for p in out_dir.iterdir() if SNAPSHOT_RE.match(p.name) and (p / MANIFEST_NAME).exists())
+    if not done:
+        return None
+    return json.loads((done[-1] / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+def _npz_arrays(columns: List[Column], values: List[tuple]) -> Dict[str, np.ndarray]:
+    """
+    Столбцы пачки -> массивы npz: целые — int64, строки — в стиле Arrow/Feather:
+    байты UTF-8 подряд (<col>.data) и смещения (<col>.offsets). NULL — маска <col>.null.
+    """
+    arrays = {}
+    for col, vals in zip(columns, values):
+        nulls = np.fromiter((v is None for v in vals), dtype=bool, count=len(vals))
+        if nulls.any():
+            arrays[f"{col.name}.null"] = nulls
+        if col.integer:
+            arrays[col.name] = np.fromiter((0 if v is None else v for v in vals), dtype=np.int64, count=len(vals))
+            continue
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in vals]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        arrays[f"{col.name}.offsets"] = offsets
+        arrays[f"{col.name}.data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return arrays
+
+
+def read_npz_part(path: Path) -> Dict[str, list]:
+    """Часть таблицы снимка в формате npz -> {колонка: список значений} (None для NULL)."""
+    with np.load(path) as z:
+        names = {key.split(".", 1)[0] for key in z.files}
+        out = {}
+        for name in sorted(names):
+            if f"{name}.offsets" in z.files:
+                offsets, data = z[f"{name}.offsets"], z[f"{name}.data"].tobytes()
+                vals = [data[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+            else:
+                vals = z[name].tolist()
+            if f"{name}.null" in z.files:
+                vals = [None if null else v for v, null in zip(vals, z[f"{name}.null"].tolist())]
+            out[name] = vals
+        return out
+
+
+class _TableWriter:
+    """Файлы одной таблицы снимка: <table>.parquet (группа строк на пачку) или <table>/part-NNNNN.npz."""
+
+    def __init__(self, root: Path, table: str, columns: List[Column], fmt: str):
+        self.columns = columns
+        self.fmt = fmt
+        self.rows = 0
+        self.parts = 0
+        if fmt == "parquet":
+            self.schema = pa.schema([(c.name, pa.int64() if c.integer else pa.string()) for c in columns])
+            self.path = root / f"{table}.parquet"
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        else:
+            self.path = root / table
+            self.path.mkdir()
+
+    def write(self, rows: List[tuple]) -> None:
+        values = list(zip(*rows))
+        if self.fmt == "parquet":
+            arrays = [pa.array(list(v), type=t) for v, t in zip(values, self.schema.types)]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        else:
+            np.savez_compressed(self.path / f"part-{self.parts:05d}.npz", **_npz_arrays(self.columns, values))
+        self.rows += len(rows)
+        self.parts += 1
+
+    def close(self) -> None:
+        if self.fmt == "parquet":
+            self._writer.close()
+
+
+def _resolve_format(fmt: str) -> str:
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"неизвестный формат снимка: {fmt}")
+    if fmt == "auto":
+        return "parquet" if pq is not None else "npz"
+    if fmt == "parquet" and pq is None:
+        raise RuntimeError("для Parquet нужен pyarrow: pip install pyarrow (или --format npz)")
+    return fmt
+
+
+def _watermarks(conn: sqlite3.Connection) -> Tuple[Dict[str, int], int]:
+    ids = {t: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {t}").fetchone()[0] for t in SNAPSHOT_TABLES}
+    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM case_changes").fetchone()[0]
+    return ids, seq
+
+
+def _iter_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: List[Column],
+    since: Tuple[Dict[str, int], int],
+    until: Tuple[Dict[str, int], int],
+    chunk_rows: int,
+) -> Iterator[List[tuple]]:
+    names = ", ".join(c.name for c in columns)
+    queries = [(data_base__37.format(table=table, columns=names), (since[0][table], until[0][table]))]
+    if table == "cases" and since[0][table]:
+        queries.insert(0, (data_base__38.format(columns=names), (since[0][table], None, since[1], until[1])))
+    for sql, params in queries:
+        cur = conn.execute(sql, params)
+        while rows := cur.fetchmany(chunk_rows):
+            yield rows
+
+
+def write_snapshot(
+    db_path: Path,
+    out_dir: Path,
+    full: bool = False,
+    fmt: str = "auto",
+    chunk_rows: int = SNAPSHOT_CHUNK_ROWS,
+) -> Path:
+    """
+    Столбцовый снимок таблиц SNAPSHOT_TABLES в out_dir/snapshot_<номер>/: Parquet
+    (если установлен pyarrow) или сжатые npz, пачками по chunk_rows строк — память
+    не зависит от размера БД. Все таблицы читаются в одной транзакции (согласованный
+    срез, параллельно с импортом). Без full и при наличии прошлого снимка — инкрементальный:
+    только строки с id больше выгруженных и дела, изменённые после него (case_changes);
+    полная картина — снимки по порядку, строка с тем же id заменяет прежнюю.
+    Если прошлый снимок сделан с другой БД или другой версии схемы, снимается полный.
+    Снимок пишется во временный каталог и переименовывается, manifest.json — последним.
+    """
+    db_path, out_dir = Path(db_path), Path(out_dir)
+    fmt = _resolve_format(fmt)
+    # только чтение: журнал case_changes нужен схеме версии 7, миграция — дело писателя
+    require_schema(db_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base = None if full else last_snapshot(out_dir)
+    number = max((int(m.group(1)) for p in out_dir.iterdir() if (m := SNAPSHOT_RE.match(p.name))), default=0) + 1
+    target = out_dir / f"snapshot_{number:05d}"
+    tmp = out_dir / f"{target.name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        until = _watermarks(conn)
+        schema_version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        since = ({t: 0 for t in SNAPSHOT_TABLES}, 0)
+        if base is not None and (base["db"], base.get("schema_version")) != (str(db_path.resolve()), schema_version):
+            # водяные знаки чужой БД (или другой схемы) к этой не применимы
+            print(f"[WARN] {db_path}: снимок {base['number']} сделан с {base['db']} "
+                  f"(схема {base.get('schema_version')}) — полный снимок")
+            base = None
+        if base is not None:
+            since = ({t: base["ids"].get(t, 0) for t in SNAPSHOT_TABLES}, base["changes_seq"])
+            shrunk = [t for t in SNAPSHOT_TABLES if until[0][t] < since[0][t]]
+            if shrunk or until[1] < since[1]:
+                # БД пересоздана после прошлого снимка: дописывать к нему нечего
+                print(f"[WARN] {db_path}: id меньше, чем в снимке {base['number']} ({', '.join(shrunk)}) — полный снимок")
+                base, since = None, ({t: 0 for t in SNAPSHOT_TABLES}, 0)
+
+        tables = {}
+        for table in SNAPSHOT_TABLES:
+            columns = table_columns(conn, table)
+            writer = _TableWriter(tmp, table, columns, fmt)
+            try:
+                with metrics.timer("snapshot.table", table=table):
+                    for rows in _iter_rows(conn, table, columns, since, until, chunk_rows):
+                        writer.write(rows)
+            finally:
+                writer.close()
+            tables[table] = {"rows": writer.rows, "parts": writer.parts, "columns": [c.name for c in columns]}
+            metrics.count("snapshot.rows", writer.rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+
+    manifest = {
+        "number": number,
+        "kind": "incremental" if base else "full",
+        "base": base["number"] if base else None,
+        "format": fmt,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "db": str(db_path.resolve()),
+        "schema_version": schema_version,
+        "ids": until[0],
+        "changes_seq": until[1],
+        "tables": tables,
+    }
+    (tmp / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.rename(target)
+    print(f"[SNAPSHOT] {target} ({manifest['kind']}, {fmt}): "
+          + ", ".join(f"{t} {info['rows']}" for t, info in tables.items()))
+    return target
+
+
+def write_snapshots(
+    db_path: Path,
+    out_dir: Path,
+    full: bool = False,
+    fmt: str = "auto",
+    chunk_rows: int = SNAPSHOT_CHUNK_ROWS,
+) -> List[Path]:
+    """write_snapshot для файла БД или для каждой секции каталога (в out_dir/court_registry_<год>/)."""
+    db_path, out_dir = Path(db_path), Path(out_dir)
+    if not db_path.is_dir():
+        return [write_snapshot(db_path, out_dir, full=full, fmt=fmt, chunk_rows=chunk_rows)]
+    return [
+        write_snapshot(part.path, out_dir / part.path.stem, full=full, fmt=fmt, chunk_rows=chunk_rows)
+        for part in list_partitions(db_path)
+    ]
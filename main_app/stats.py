@@ -0,0 +1,57 @@
+from __future__ import annotations
+import sqlite3
+from pathlib import Path
+from typing import Dict, List
+
+from main_app.constants import PARTITION_RE
+
+STATS_TABLES = ("cases", "judges", "case_judges", "case_events", "courts", "vocab")
+
+
+def db_stats(db_path: Path) -> Dict[str, object]:
+    """
+    Сводка по файлу БД без изменения схемы (соединение только на чтение):
+    версия схемы, число строк таблиц данных, FTS, состояние манифеста, размер с WAL.
+    """
+    db_path = Path(db_path)
+    if not db_path.is_file():
+        raise RuntimeError(f"Нет БД: {db_path}")
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        present = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        stats: Dict[str, object] = {"schema_version": conn.execute("PRAGMA user_version;").fetchone()[0]}
+        for table in STATS_TABLES:
+            if table in present:
+                stats[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        stats["fts"] = "case_search" in present
+        if "ingest_archives" in present:
+            for status, n in conn.execute("SELECT status, COUNT(*) FROM ingest_archives GROUP BY status ORDER BY status"):
+                stats[f"archives.{status}"] = n
+        if "ingest_members" in present:
+            for status, n in conn.execute("SELECT status, COUNT(*) FROM ingest_members GROUP BY status ORDER BY status"):
+                stats[f"members.{status}"] = n
+    finally:
+        conn.close()
+    wal = db_path.with_name(db_path.name + "-wal")
+    stats["size_mb"] = round((db_path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)) / 1024 / 1024, 1)
+    return stats
+
+
+def format_stats(db_path: Path) -> str:
+    """
+    Текстовая сводка: по файлу БД или по каждой секции каталога court_registry_<год>.db.
+    RuntimeError — нет файла БД (или секций в каталоге).
+    """
+    db_path = Path(db_path)
+    if db_path.is_dir():
+        paths: List[Path] = sorted(p for p in db_path.iterdir() if PARTITION_RE.match(p.name))
+    else:
+        paths = [db_path]
+    if not paths:
+        raise RuntimeError(f"Нет БД: {db_path}")
+    blocks = []
+    for path in paths:
+        lines = [f"{path}"]
+        lines += [f"  {key:<24}{value!s:>14}" for key, value in db_stats(path).items()]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+import math
+import unicodedata
+
+from main_app.constants import CASE_NUMBER_KEY_MAP
+
+_CASE_NUMBER_KEY_TABLE = str.maketrans(CASE_NUMBER_KEY_MAP)
+
+
+def sv(x) -> str:
+    if isinstance(x, str):
+        s = x.strip()
+        return s
+    # NaN из pandas — float; сам pandas здесь не нужен (модуль импортируют и лёгкие команды)
+    if x is None or (isinstance(x, float) and math.isnan(x)):
+        return ""
+    try:
+        return str(x).strip()
+    except Exception:
+        return ""
+
+
+def case_number_key(case_number) -> str:
+    """
+    Канонический ключ номера дела для сравнения без учёта записи: NFKC (полноширинные
+    символы), верхний регистр, кириллические двойники латинских букв и варианты
+    тире/косой черты приводятся к одному символу, пробелы удаляются.
+    «757 / 1234/23–Ц» и «757/1234/23-ц» дают один ключ.
+    """
+    s = unicodedata.normalize("NFKC", sv(case_number)).upper().translate(_CASE_NUMBER_KEY_TABLE)
+    return "".join(s.split())
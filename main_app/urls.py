@@ -1,93 +1,307 @@
+import hashlib
+import json
+import threading
 import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Iterator
-from urllib.parse import urljoin, urlparse
+from typing import Iterator, NamedTuple
+from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
+import requests
 
-from main_app.constants import BASE_LIST_URL, DATE_RE
+from main_app.constants import (
+    BASE_LIST_URL,
+    DOWNLOAD_RETRIES,
+    DOWNLOAD_SEGMENTS,
+    DOWNLOAD_SEGMENT_MIN_BYTES,
+    LIST_CONCURRENCY,
+    LIST_RATE_PER_SEC,
+)
+from main_app.listing import RateLimiter, scan_listing_page
+from main_app.metrics import metrics
 
 
-def download_file(url: str, dest_dir: Path, SESSION, chunk_size) -> Path:
+class RemoteInfo(NamedTuple):
+    size: int | None
+    ranges: bool
+    etag: str | None
+    last_modified: str | None
+
+    @property
+    def validator(self) -> str:
+        return self.etag or self.last_modified or ""
+
+
+def probe_download(url: str, SESSION, etag: str | None = None,
+                   last_modified: str | None = None) -> RemoteInfo | None:
+    """
+    Размер файла, поддержка Range и валидаторы (ETag/Last-Modified).
+    Запрашивается один байт: это надёжнее HEAD, который часть серверов не поддерживает.
+    С etag/last_modified запрос условный: None — архив не изменился (HTTP 304).
+    """
+    headers = {"Range": "bytes=0-0"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    with SESSION.get(url, headers=headers, stream=True, timeout=30) as r:
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if r.status_code == 206:
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            return RemoteInfo(int(total) if total.isdigit() else None, True, etag, last_modified)
+        length = r.headers.get("Content-Length", "")
+        return RemoteInfo(int(length) if length.isdigit() else None, False, etag, last_modified)
+
+
+def _plan_segments(size: int) -> list[dict]:
+    n = max(1, min(DOWNLOAD_SEGMENTS, size // DOWNLOAD_SEGMENT_MIN_BYTES))
+    step = -(-size // n)
+    return [
+        {"start": start, "end": min(start + step, size) - 1, "done": 0}
+        for start in range(0, size, step)
+    ]
+
+
+def _load_state(state_path: Path, part_path: Path, url: str, size: int, validator: str) -> dict | None:
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (state.get("url"), state.get("size"), state.get("validator")) != (url, size, validator):
+        return None
+    if not part_path.exists() or part_path.stat().st_size != size:
+        return None
+    return state
+
+
+def _fetch_segment(url: str, SESSION, part_path: Path, seg: dict, save, chunk_bytes: int) -> None:
+    last_err = None
+    for attempt in range(DOWNLOAD_RETRIES):
+        pos = seg["start"] + seg["done"]
+        if pos > seg["end"]:
+            return
+        try:
+            headers = {"Range": f"bytes={pos}-{seg['end']}"}
+            with SESSION.get(url, headers=headers, stream=True, timeout=120) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise RuntimeError(f"сервер проигнорировал Range (HTTP {r.status_code})")
+                with open(part_path, "r+b") as f:
+                    f.seek(pos)
+                    for chunk in r.iter_content(chunk_size=chunk_bytes):
+                        if chunk:
+                            f.write(chunk)
+                            f.flush()
+                            metrics.count("download.bytes", len(chunk))
+                            # прогресс фиксируется только после записи байтов в файл
+                            seg["done"] += len(chunk)
+                            save()
+            if seg["start"] + seg["done"] > seg["end"]:
+                return
+            last_err = RuntimeError("соединение закрыто до конца сегмента")
+        except (requests.RequestException, OSError) as e:
+            last_err = e
+        time.sleep(min(2 ** attempt, 30))
+    raise RuntimeError(f"Сегмент {seg['start']}-{seg['end']} не скачан: {last_err}")
+
+
+def _download_stream(url: str, SESSION, part_path: Path, chunk_bytes: int) -> None:
+    last_err = None
+    for attempt in range(DOWNLOAD_RETRIES):
+        try:
+            with SESSION.get(url, stream=True, timeout=120) as r:
+                r.raise_for_status()
+                with open(part_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_bytes):
+                        if chunk:
+                            f.write(chunk)
+                            metrics.count("download.bytes", len(chunk))
+            return
+        except requests.RequestException as e:
+            last_err = e
+            time.sleep(min(2 ** attempt, 30))
+    raise RuntimeError(f"Не удалось скачать {url}: {last_err}")
+
+
+def _verify_zip(path: Path, size: int | None) -> None:
+    actual = path.stat().st_size
+    if size is not None and actual != size:
+        raise RuntimeError(f"{path.name}: размер {actual} вместо {size}")
+    # открытие читает central directory — обрезанный или битый архив не пройдёт
+    with zipfile.ZipFile(path):
+        pass
+
+
+def download_name(url: str) -> str:
+    """Имя файла в каталоге загрузок: хэш URL + имя из URL — одноимённые архивы разных URL не путаются."""
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return f"{digest}_{Path(urlparse(url).path).name or 'archive.zip'}"
+
+
+def _meta_path(dest_path: Path) -> Path:
+    return dest_path.with_name(f"{dest_path.name}.json")
+
+
+def remove_download(dest_path: Path) -> None:
+    """Удаляет скачанный архив вместе с записью о его валидаторе."""
+    dest_path.unlink(missing_ok=True)
+    _meta_path(dest_path).unlink(missing_ok=True)
+
+
+def download_file(url: str, dest_dir: Path, SESSION, chunk_size, info: RemoteInfo | None = None) -> Path:
+    """
+    Скачивает архив в dest_dir (имя — download_name). Если сервер поддерживает Range,
+    большой файл качается несколькими параллельными сегментами в <имя>.part, прогресс
+    сегментов пишется в <имя>.part.json — после обрыва или перезапуска загрузка
+    продолжается с места остановки. Результат проверяется по размеру и
+    central directory ZIP до переименования в итоговое имя; URL, размер и валидатор
+    (ETag/Last-Modified) готового файла пишутся в <имя>.json. Уже скачанный файл
+    переиспользуется, только если они совпадают с текущими ответами сервера.
+    info — результат probe_download, если он уже получен вызывающим кодом.
+    """
     dest_dir.mkdir(parents=True, exist_ok=True)
-    filename = Path(urlparse(url).path).name or f"archive_{int(time.time())}.zip"
+    filename = download_name(url)
     dest_path = dest_dir / filename
+    meta_path = _meta_path(dest_path)
+    part_path = dest_dir / f"{filename}.part"
+    state_path = dest_dir / f"{filename}.part.json"
+    chunk_bytes = chunk_size * 1024 * 1024
 
-    with SESSION.get(url, stream=True, timeout=120) as r:
-        r.raise_for_status()
-        with open(dest_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=chunk_size*1024*1024):
-                if chunk:
-                    f.write(chunk)
+    if info is None:
+        info = probe_download(url, SESSION)
+    size, ranges, validator = info.size, info.ranges, info.validator
+
+    if dest_path.exists():
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        try:
+            if (meta.get("url"), meta.get("size"), meta.get("validator")) != (url, size, validator):
+                raise RuntimeError("архив на сервере изменился")
+            _verify_zip(dest_path, size)
+            return dest_path
+        except (RuntimeError, zipfile.BadZipFile):
+            remove_download(dest_path)
+
+    if ranges and size:
+        state = _load_state(state_path, part_path, url, size, validator)
+        if state is None:
+            state = {"url": url, "size": size, "validator": validator, "segments": _plan_segments(size)}
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+        else:
+            done = sum(seg["done"] for seg in state["segments"])
+            print(f"[RESUME] {filename}: докачка с {done} из {size} байт")
+
+        lock = threading.Lock()
+
+        def save() -> None:
+            with lock:
+                tmp = state_path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(state), encoding="utf-8")
+                tmp.replace(state_path)
 
+        save()
+        segments = state["segments"]
+        with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="segment") as pool:
+            for fut in [pool.submit(_fetch_segment, url, SESSION, part_path, seg, save, chunk_bytes) for seg in segments]:
+                fut.result()
+    else:
+        _download_stream(url, SESSION, part_path, chunk_bytes)
+
+    try:
+        _verify_zip(part_path, size)
+    except (RuntimeError, zipfile.BadZipFile):
+        part_path.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise
+    part_path.replace(dest_path)
+    meta_path.write_text(json.dumps({"url": url, "size": size, "validator": validator}), encoding="utf-8")
+    state_path.unlink(missing_ok=True)
     return dest_path
 
 
-def extract_date_from_context(a_zip) -> str | None:
-    node = a_zip
-    for _ in range(6):
-        if not node:
-            break
-        text = node.get_text(" ", strip=True)
-        m = DATE_RE.search(text)
-        if m:
-            return m.group(1)
-        node = node.parent
-    sib = a_zip.find_previous(lambda tag: DATE_RE.search(tag.get_text() or ""))
-    if sib:
-        m = DATE_RE.search(sib.get_text())
-        if m:
-            return m.group(1)
-    return None
-
-
-def iter_year_zip_links(year: int, SESSION, max_pages: int = 50) -> Iterator[str]:
+def _fetch_page(url: str, SESSION, limiter: RateLimiter):
+    limiter.wait()
+    with metrics.timer("crawl.fetch", url=url):
+        resp = SESSION.get(url, timeout=30)
+    metrics.count("crawl.pages")
+    metrics.count("crawl.bytes", len(resp.content))
+    return resp
+
+
+def iter_year_zip_links(
+    year: int,
+    SESSION,
+    max_pages: int = 50,
+    concurrency: int = LIST_CONCURRENCY,
+    rate: float = LIST_RATE_PER_SEC,
+    list_url: str = BASE_LIST_URL,
+) -> Iterator[str]:
+    """
+    Страницы листинга качаются параллельно (до concurrency наперёд, не чаще rate
+    запросов в секунду), а разбираются строго по порядку — ранний стоп по году
+    работает как раньше; уже запрошенные страницы за точкой остановки отбрасываются.
+    """
     seen = set()
+    limiter = RateLimiter(rate)
 
-    for page in range(1, max_pages + 1):
-        url = BASE_LIST_URL.format(page=page)
-        resp = SESSION.get(url, timeout=30)
-        if resp.status_code != 200:
-            print(f"[WARN] {url} -> HTTP {resp.status_code}")
-            break
-
-        soup = BeautifulSoup(resp.text, "html.parser")
-        page_links = 0
-        page_years = set()
-
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            path = (urlparse(href).path or "").lower()
-            if not path.endswith(".zip"):
-                continue
-
-            full_url = urljoin(url, href)
-            if full_url in seen:
-                continue
-
-            date_str = extract_date_from_context(a)
-            if not date_str:
-                continue
-
-            d = datetime.strptime(date_str, "%d.%m.%Y").date()
-            page_years.add(d.year)
-
-            if d.year == year:
-                seen.add(full_url)
-                page_links += 1
-                yield full_url
-
-        if page_links > 0:
-            print(f"[INFO] Страница {page}: найдено {page_links} файлов за {year}")
-        else:
-            print(f"[INFO] Страница {page}: ничего не найдено")
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="listing")
+    try:
+        pages = iter(range(1, max_pages + 1))
+        inflight = deque()
+        for page in islice(pages, max(1, concurrency)):
+            url = list_url.format(page=page)
+            inflight.append((page, url, pool.submit(_fetch_page, url, SESSION, limiter)))
+
+        while inflight:
+            page, url, fut = inflight.popleft()
+            for next_page in islice(pages, 1):
+                next_url = list_url.format(page=next_page)
+                inflight.append((next_page, next_url, pool.submit(_fetch_page, next_url, SESSION, limiter)))
+
+            resp = fut.result()
+            if resp.status_code != 200:
+                print(f"[WARN] {url} -> HTTP {resp.status_code}")
+                break
+
+            page_links = 0
+            page_years = set()
+
+            with metrics.timer("crawl.parse", url=url):
+                page_items = scan_listing_page(resp.text, url)
+            for full_url, date_str in page_items:
+                if full_url in seen or not date_str:
+                    continue
+
+                d = datetime.strptime(date_str, "%d.%m.%Y").date()
+                page_years.add(d.year)
+
+                if d.year == year:
+                    seen.add(full_url)
+                    page_links += 1
+                    yield full_url
 
-        if page_years and max(page_years) < year:
-            print(f"[STOP] встретили {max(page_years)}, дальше страниц за {year} не будет")
-            break
+            if page_links > 0:
+                print(f"[INFO] Страница {page}: найдено {page_links} файлов за {year}")
+            else:
+                print(f"[INFO] Страница {page}: ничего не найдено")
 
-        if page_links == 0 and not page_years:
-            break
+            if page_years and max(page_years) < year:
+                print(f"[STOP] встретили {max(page_years)}, дальше страниц за {year} не будет")
+                break
 
-        time.sleep(0.5)
+            if page_links == 0 and not page_years:
+                break
+    finally:
+        # уже запрошенные страницы за точкой остановки не ждём
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,38 @@
+import argparse
+import json
+from pathlib import Path
+
+from main_app.bench.scenarios import SCENARIOS, compare_reports, run_benchmarks
+from main_app.paths import MAIN_DIR
+
+
+def parser_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline ingest/export benchmark")
+    parser.add_argument("--workspace", type=Path, default=MAIN_DIR / "output_dir" / "bench")
+    parser.add_argument("--archives", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows per CSV")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Repeatable; default: all")
+    parser.add_argument("--out", type=Path, default=None, help="JSON report path")
+    parser.add_argument("--compare", type=Path, default=None, help="Previous JSON report")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parser_args()
+    args.workspace.mkdir(parents=True, exist_ok=True)
+    report = run_benchmarks(
+        args.workspace,
+        archives=args.archives,
+        rows_per_csv=args.rows,
+        year=args.year,
+        scenarios=args.scenario,
+        seed=args.seed,
+    )
+    out = args.out or args.workspace / "report.json"
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[BENCH] Отчёт: {out}")
+    if args.compare:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_reports(old, report)))
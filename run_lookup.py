@@ -0,0 +1,34 @@
+import argparse
+import sys
+from pathlib import Path
+
+from main_app.constants import LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL, LOOKUP_HOST, LOOKUP_POOL_SIZE, LOOKUP_PORT
+from main_app.lookup import run_lookup_server
+from main_app.paths import DB_PATH
+
+
+def parser_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON case lookup service")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="DB file or directory of per-year partitions")
+    parser.add_argument("--host", default=LOOKUP_HOST)
+    parser.add_argument("--port", type=int, default=LOOKUP_PORT)
+    parser.add_argument("--pool-size", type=int, default=LOOKUP_POOL_SIZE, help="Read-only SQLite connections")
+    parser.add_argument("--cache-size", type=int, default=LOOKUP_CACHE_SIZE, help="Cached case numbers")
+    parser.add_argument("--ttl", type=float, default=LOOKUP_CACHE_TTL, help="Cache TTL, seconds")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parser_args()
+    try:
+        run_lookup_server(
+            args.db,
+            host=args.host,
+            port=args.port,
+            pool_size=args.pool_size,
+            cache_size=args.cache_size,
+            ttl=args.ttl,
+        )
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        sys.exit(1)
@@ -0,0 +1,53 @@
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from main_app.constants import SEARCH_LIMIT
+from main_app.db import require_schema
+from main_app.paths import DB_PATH
+from main_app.search import SEARCH_COLUMNS, enable_search, search_cases
+
+
+def parser_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Full-text search over case descriptions and participants")
+    parser.add_argument("query", nargs="?", default=None)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--in", dest="column", choices=SEARCH_COLUMNS, default=None, help="Search one column only")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    parser.add_argument("--raw", action="store_true", help="Pass the query to FTS5 MATCH as is")
+    parser.add_argument("--enable", action="store_true", help="Create the index for an existing DB")
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    # поиск только читает: схему не мигрируем; на запись открываем лишь для --enable
+    require_schema(args.db)
+    if args.enable:
+        conn = sqlite3.connect(str(args.db))
+        try:
+            enable_search(conn)
+        finally:
+            conn.close()
+    if not args.query:
+        return 0
+    conn = sqlite3.connect(f"{args.db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        t0 = time.perf_counter()
+        hits = search_cases(conn, args.query, limit=args.limit, column=args.column, raw=args.raw)
+        for hit in hits:
+            print(f"{hit.case_id}\t{hit.court_name}\t{hit.case_number}\t{hit.score:.3f}")
+        print(f"[FTS] Найдено: {len(hits)} за {(time.perf_counter() - t0) * 1000:.1f} мс")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main(parser_args()))
+    except (RuntimeError, ValueError, sqlite3.OperationalError) as e:
+        # нет БД/индекса, пустой запрос, синтаксис --raw
+        print(f"[ERR] {e}")
+        sys.exit(1)